@@ -1,110 +1,489 @@
-import cloudinary.uploader
-from flask import Flask, render_template, request, redirect, flash, url_for, session
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import Mapped, mapped_column, relationship, joinedload
-from sqlalchemy import Date, String, ForeignKey
-from datetime import date, datetime
+from flask import Blueprint, Flask, Response, current_app, render_template, request, redirect, flash, url_for, session, jsonify, send_from_directory, send_file, stream_with_context
+from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from collections import Counter
+from datetime import date, datetime, timedelta
+import click
+import mimetypes
 import re
 import secrets
-import cloudinary
+import threading
+import time
 import os
 from dotenv import load_dotenv
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+import events
+import exports
+import migrations
+import reminders
+import search
+import stats
+from assets import AssetManifest
+from config import load_config
+from passwords import HasherBusy, PasswordHasher, hash_password
+from pool_metrics import PoolMonitor, engine_options
+from query_profiler import QueryProfiler, query_budget
+from scheduling import WEEKDAYS, AvailabilityIndex
+from sessions import ServerSideSessionInterface, make_store
+from models import db, User, Appointment, Prescription, Doctor, SearchDocument, SlotCapacity, DEFAULT_DAILY_CAPACITY
+from uploads import IMAGE_EXTENSIONS, THUMBNAIL_SIZES, UploadQueue, image_extension, make_backend
+
+bp = Blueprint('main', __name__)
+
+PLACEHOLDER_IMAGE = '/static/images/no-profile.png'
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+
+@click.command('sweep-sessions')
+@with_appcontext
+def sweep_sessions_command():
+    """Delete expired server-side sessions."""
+    removed = current_app.session_interface.store.sweep()
+    print(f"Removed {removed} expired sessions.")
+
+
+@click.command('hash-passwords')
+@click.option('--batch', default=500, help="Rows per transaction.")
+@with_appcontext
+def hash_passwords_command(batch):
+    """Hash every password still stored in plaintext."""
+    n = current_app.config['PASSWORD_SCRYPT_N']
+    converted = 0
+    while True:
+        users = User.query.filter(~User.password.startswith('scrypt$')).limit(batch).all()
+        if not users:
+            break
+        for user in users:
+            user.password = hash_password(user.password, n)
+        db.session.commit()
+        converted += len(users)
+    print(f"Hashed {converted} plaintext passwords.")
+
+
+@click.command('export-appointments')
+@click.option('--format', 'fmt', type=click.Choice(sorted(exports.FORMATS)), default='csv')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help="First appointment date to include.")
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help="Last appointment date to include.")
+@click.option('--doctor', type=int, help="Only this doctor's appointments (user id).")
+@click.option('--output', type=click.File('w'), default='-', help="Output file, stdout by default.")
+@with_appcontext
+def export_appointments_command(fmt, start, end, doctor, output):
+    """Stream appointments with their prescriptions as CSV or NDJSON."""
+    rows = exports.export_rows(start and start.date(), end and end.date(), doctor)
+    for chunk in exports.stream(fmt, rows):
+        output.write(chunk)
+
+
+@click.command('reindex-search')
+@with_appcontext
+def reindex_search_command():
+    """Rebuild the full-text search documents from appointments and prescriptions."""
+    with db.engine.begin() as conn:
+        search.rebuild(conn)
+    print(f"Indexed {db.session.query(SearchDocument).count()} search documents.")
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the per-doctor daily statistics from appointments."""
+    with db.engine.begin() as conn:
+        stats.rebuild(conn)
+    print("Rebuilt doctor daily statistics.")
+
+
+@click.command('check-stats')
+@with_appcontext
+def check_stats_command():
+    """Compare the per-doctor daily statistics with appointments."""
+    with db.engine.connect() as conn:
+        drift = stats.check(conn)
+    for doctor_id, day, status, stored, actual in drift:
+        print(f"doctor {doctor_id} {day} {status}: stored {stored}, actual {actual}")
+    if drift:
+        raise click.ClickException(f"{len(drift)} counters drifted; run `flask rebuild-stats`.")
+    print("Doctor daily statistics are consistent.")
+
+
+@click.command('send-reminders')
+@with_appcontext
+def send_reminders_command():
+    """Send reminders for upcoming appointments that have none yet."""
+    run = current_app.extensions['reminders'].run()
+    print(f"Sent {run['messages_sent']} reminder messages for {run['claimed']} appointments "
+          f"({run['messages_failed']} failed, {run['skipped']} claimed elsewhere) in {run['seconds']}s.")
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint the static files and write their compressed variants."""
+    manifest = current_app.extensions['assets']
+    manifest.scan()
+    written = manifest.compress()
+    print(f"Fingerprinted {len(manifest.files)} static files, wrote {written} compressed variants.")
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Apply pending schema migrations."""
+    applied = migrations.upgrade(db.engine, db.metadata)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
+
+
+def set_profile_picture(app, user_id, url):
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == user_id).values(image_filename=url))
+        db.session.commit()
 
-load_dotenv()
-database_url = os.getenv("DATABASE_URL")
-secret_key = os.getenv("SECRET_KEY")
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+def enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite enforces foreign keys, and so ON DELETE CASCADE, only when asked on each connection.
+    dbapi_connection.execute("PRAGMA foreign_keys = ON")
 
-app = Flask(__name__)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL")
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def avatar(url, size=160):
+    """Sized-down URL for a profile picture, or the placeholder when there is none."""
+    if not url or url == PLACEHOLDER_IMAGE:
+        return url_for('static', filename='images/no-profile.png')
+    return current_app.extensions['media'].thumbnail_url(url, size)
 
-app.secret_key = secrets.token_hex(32)
 
-db = SQLAlchemy(app)
+def immutable(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
-class User(db.Model):
-    __tablename__ = "users"
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    fullname: Mapped[str] = mapped_column(String(50), nullable=False)
-    email: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
-    password: Mapped[str] = mapped_column(String(128), nullable=False)  
-    phone: Mapped[str] = mapped_column(String(20), nullable=False)
+def fingerprint_static(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = current_app.extensions['assets'].url_name(values['filename'])
 
-    gender: Mapped[str] = mapped_column(String(10), nullable=False)
-    date_of_birth: Mapped[date] = mapped_column(Date(), nullable=False)
-    image_filename: Mapped[str] = mapped_column(String(100)) 
-    address: Mapped[str] = mapped_column(String(200), nullable=False)
-    
-    blood_group: Mapped[str] = mapped_column(String(5), nullable=False)
-    emergency_contact: Mapped[str] = mapped_column(String(20), nullable=False)
-    role: Mapped[str] = mapped_column(String(10), nullable=False)  
-    
-    doctor_profile: Mapped["Doctor"] = relationship("Doctor", back_populates="user", uselist=False)
 
-class Appointment(db.Model):
-    __tablename__ = "appointments"
-    
-    id: Mapped[int] = mapped_column(primary_key=True)
-    
-    patient_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
-    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
-    
-    appointment_date: Mapped[date] = mapped_column(Date, nullable=False)
-    appointment_details:Mapped[str] = mapped_column(String(200), nullable=False)
-    status:Mapped[str] = mapped_column(String(200), nullable=False)
-    
-    patient: Mapped["User"] = relationship("User", foreign_keys=[patient_id], backref="patient_appointments")
-    doctor: Mapped["User"] = relationship("User", foreign_keys=[doctor_id], backref="doctor_appointments")
+def static_asset(filename):
+    """Replaces Flask's static view: fingerprinted names are served precompressed and cached for good."""
+    manifest = current_app.extensions['assets']
+    resolved = manifest.resolve(filename)
+    if not resolved:
+        return send_from_directory(current_app.static_folder, filename)
+    logical, digest = resolved
+    response = None
+    for encoding in ('br', 'gzip'):
+        path = manifest.variant(logical, digest, encoding) if encoding in request.accept_encodings else None
+        if path:
+            response = send_file(path, mimetype=mimetypes.guess_type(logical)[0], max_age=MEDIA_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    if response is None:
+        response = send_from_directory(current_app.static_folder, logical, max_age=MEDIA_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    return immutable(response)
 
-class Prescription(db.Model):
-    __tablename__ = "prescriptions"
-    
-    id: Mapped[int] = mapped_column(primary_key = True)
-    
-    appointment_id: Mapped[int] = mapped_column(ForeignKey('appointments.id'), nullable=False)
-    patient_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
-    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
-    
-    prescriptions :Mapped[str] = mapped_column(String(200),nullable = True)
-    
-    patient: Mapped["User"] = relationship("User", foreign_keys=[patient_id], backref="patient_prescriptions")
-    doctor: Mapped["User"] = relationship("User", foreign_keys=[doctor_id], backref="doctor_prescriptions")
-    
-    def __repr__(self):
-        return f"<User {self.id}: {self.fullname}>"
 
-class Doctor(db.Model):
-    __tablename__ = "doctors"
+APPOINTMENTS_PER_PAGE = 20
+SLOT_RESULTS = 12
+SEARCH_RESULTS_PER_PAGE = 20
+BULK_MAX_IDS = 500
+BUSY_MESSAGE = "We are handling a lot of sign-ins right now. Please try again in a moment."
+
+
+def encode_cursor(appointment):
+    return f"{appointment.appointment_date.isoformat()}_{appointment.id}"
+
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, unique=True)
-    specialization: Mapped[str] = mapped_column(String(100), nullable=False)
-    qualification: Mapped[str] = mapped_column(String(100), nullable=False)
-    experience: Mapped[str] = mapped_column(String(10), nullable=False)
-    license_number: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
-    hospital_name: Mapped[str] = mapped_column(String(100), nullable=False)
-    bio: Mapped[str] = mapped_column(String(300), nullable=True)
+def decode_cursor(cursor):
+    try:
+        day, appointment_id = cursor.split('_')
+        return datetime.strptime(day, "%Y-%m-%d").date(), int(appointment_id)
+    except (AttributeError, ValueError):
+        return None
 
-    user: Mapped["User"] = relationship("User", back_populates="doctor_profile")
 
-with app.app_context():
-    db.create_all()
+def reserve_slot(doctor_id, day):
+    """Take one slot from the doctor's ledger for ``day``. Returns False when the day is full.
 
+    The booking itself is a single conditional UPDATE, so concurrent workers
+    can never push ``booked`` past ``capacity``. The caller owns the
+    transaction and must commit or roll back.
+    """
+    exists = db.session.query(SlotCapacity.id).filter_by(doctor_id=doctor_id, appointment_date=day).first()
+    if not exists:
+        capacity = db.session.query(Doctor.daily_capacity).filter_by(user_id=doctor_id).scalar()
+        # Days booked before the ledger existed are seeded from their appointments once.
+        booked = Appointment.query.filter_by(doctor_id=doctor_id, appointment_date=day).count()
+        try:
+            with db.session.begin_nested():
+                db.session.add(SlotCapacity(
+                    doctor_id=doctor_id,
+                    appointment_date=day,
+                    capacity=capacity or DEFAULT_DAILY_CAPACITY,
+                    booked=booked
+                ))
+        except IntegrityError:
+            pass  # another worker created the row first
+    result = db.session.execute(
+        update(SlotCapacity)
+        .where(SlotCapacity.doctor_id == doctor_id,
+               SlotCapacity.appointment_date == day,
+               SlotCapacity.booked < SlotCapacity.capacity)
+        .values(booked=SlotCapacity.booked + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def release_slot(doctor_id, day, count=1):
+    db.session.execute(
+        update(SlotCapacity)
+        .where(SlotCapacity.doctor_id == doctor_id,
+               SlotCapacity.appointment_date == day,
+               SlotCapacity.booked >= count)
+        .values(booked=SlotCapacity.booked - count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class BulkConflict(Exception):
+    """Selected appointments changed between the locking SELECT and the write."""
+
+
+def owned_scheduled(doctor_id, ids):
+    return Appointment.id.in_(ids), Appointment.doctor_id == doctor_id, Appointment.status == 'Scheduled'
+
+
+def lock_owned(doctor_id, ids):
+    return db.session.execute(
+        select(Appointment.id, Appointment.patient_id, Appointment.doctor_id,
+               Appointment.appointment_date, Appointment.appointment_time)
+        .where(*owned_scheduled(doctor_id, ids))
+        .with_for_update()
+    ).all()
+
+
+def complete_appointments(doctor_id, ids):
+    """Mark the doctor's Scheduled appointments among ``ids`` Completed with one UPDATE.
+
+    Ownership and status are part of the UPDATE's WHERE clause, so ids of
+    other doctors' appointments are skipped, never changed. Returns the
+    affected rows. The caller owns the transaction.
+    """
+    rows = lock_owned(doctor_id, ids)
+    if rows:
+        result = db.session.execute(
+            update(Appointment).where(*owned_scheduled(doctor_id, ids)).values(status='Completed')
+            .execution_options(synchronize_session=False))
+        if result.rowcount != len(rows):
+            raise BulkConflict()
+        for day, count in Counter(row.appointment_date for row in rows).items():
+            stats.move(doctor_id, day, 'Scheduled', 'Completed', count)
+    return rows
+
+
+def cancel_appointments(doctor_id, ids):
+    """Delete the doctor's Scheduled appointments among ``ids`` with one DELETE, as ``cancel_appointment`` does for one.
+
+    Their prescriptions, search documents and reminders go with them
+    (ON DELETE CASCADE). Slots and statistics are adjusted once per day.
+    """
+    rows = lock_owned(doctor_id, ids)
+    if rows:
+        result = db.session.execute(
+            delete(Appointment).where(*owned_scheduled(doctor_id, ids))
+            .execution_options(synchronize_session=False))
+        if result.rowcount != len(rows):
+            raise BulkConflict()
+        for day, count in Counter(row.appointment_date for row in rows).items():
+            release_slot(doctor_id, day, count)
+            stats.move(doctor_id, day, 'Scheduled', stats.CANCELLED, count)
+    return rows
+
+
+# action -> (operation, status the appointments end up in)
+BULK_ACTIONS = {
+    'complete': (complete_appointments, 'Completed'),
+    'cancel': (cancel_appointments, stats.CANCELLED),
+}
+
+
+def appointment_channels(appointment):
+    return [f"doctor:{appointment.doctor_id}", f"patient:{appointment.patient_id}"]
+
+
+def created_row(appointment, patient_name, doctor_name):
+    """A new appointment as appointment-rows.html renders it.
+
+    Built before the commit: reading ``appointment`` afterwards would
+    reload it from the database.
+    """
+    return {
+        'id': appointment.id,
+        'appointment_date': appointment.appointment_date,
+        'appointment_time': appointment.appointment_time,
+        'status': appointment.status,
+        'patient_name': patient_name,
+        'doctor': {'fullname': doctor_name},
+    }
+
+
+def publish_created(row, channels):
+    """Push a new appointment to the doctor's worklist and the patient's list, each with its rendered row."""
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    broker = current_app.extensions['events']
+    for role, channel in zip(('Doctor', 'Patient'), channels):
+        broker.publish([channel], 'appointment.created', {
+            'id': row['id'],
+            'date': row['appointment_date'].isoformat(),
+            'status': row['status'],
+            'html': render_template('appointment-rows.html', appointments=[row], role=role),
+        })
+
+
+def publish_status(appointment, status):
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    current_app.extensions['events'].publish(
+        appointment_channels(appointment), 'appointment.status', {'id': appointment.id, 'status': status})
+
+
+def publish_prescription(appointment, prescription):
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    current_app.extensions['events'].publish(appointment_channels(appointment), 'prescription.added', {
+        'appointment_id': appointment.id,
+        'id': prescription.id,
+        'prescriptions': prescription.prescriptions,
+    })
+
+
+def doctor_directory():
+    """All doctors as (id, fullname, specialization, hospital_name) rows.
+
+    The list is cached in-process for DOCTOR_DIRECTORY_TTL seconds. This
+    worker drops it as soon as a doctor registers; other workers pick the
+    new doctor up when their copy expires.
+    """
+    cache = current_app.extensions['doctor_directory']
+    if cache['rows'] is not None and time.monotonic() < cache['expires']:
+        return cache['rows']
+    with cache['lock']:
+        if cache['rows'] is None or time.monotonic() >= cache['expires']:
+            cache['rows'] = db.session.query(
+                User.id,
+                User.fullname,
+                Doctor.specialization,
+                Doctor.hospital_name
+            ).join(Doctor, Doctor.user_id == User.id).filter(
+                User.role == 'Doctor').order_by(User.fullname).all()
+            cache['expires'] = time.monotonic() + current_app.config['DOCTOR_DIRECTORY_TTL']
+        return cache['rows']
+
+
+def invalidate_doctor_directory():
+    cache = current_app.extensions['doctor_directory']
+    with cache['lock']:
+        cache['rows'] = None
+
+
+def specializations():
+    return sorted({row.specialization for row in doctor_directory()})
+
+
+def find_slots(specialization, start, limit):
+    """Next ``limit`` free slots in ``specialization`` as (day, time, doctor row) tuples."""
+    doctors = {row.id: row for row in doctor_directory() if row.specialization == specialization}
+    slots = current_app.extensions['availability'].free_slots(list(doctors), start, limit)
+    return [(day, at, doctors[doctor_id]) for day, at, doctor_id in slots]
+
+
+def parse_hours(form):
+    """Weekly (start, end) spans from the working-hours form; None for days left empty."""
+    hours = []
+    for weekday in range(7):
+        start, end = form.get(f'start_{weekday}'), form.get(f'end_{weekday}')
+        if not start or not end:
+            hours.append(None)
+            continue
+        try:
+            start, end = (datetime.strptime(value, '%H:%M').time() for value in (start, end))
+        except ValueError:
+            raise ValueError(f"{WEEKDAYS[weekday]}: times must be HH:MM.")
+        if start >= end:
+            raise ValueError(f"{WEEKDAYS[weekday]}: the end time must be after the start time.")
+        hours.append((start, end))
+    return hours
 
-@app.route('/')
+
+def worklist_window(window, start=None, end=None):
+    """Resolve a worklist window name ('today', 'week' or 'range') to an inclusive (start, end) date pair."""
+    today = date.today()
+    if window == 'week':
+        monday = today - timedelta(days=today.weekday())
+        return monday, monday + timedelta(days=6)
+    if window == 'range':
+        try:
+            start_date = datetime.strptime(start, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return today, today
+        return min(start_date, end_date), max(start_date, end_date)
+    return today, today
+
+
+def doctor_worklist(doctor_id, start_date, end_date):
+    """Scheduled appointments of one doctor in a date window.
+
+    Rows are plain (id, appointment_date, appointment_time, status, patient_id,
+    patient_name) tuples served from ix_appointments_doctor_date_status, not
+    ORM entities.
+    """
+    return db.session.query(
+        Appointment.id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.status,
+        Appointment.patient_id,
+        User.fullname.label('patient_name')
+    ).join(User, User.id == Appointment.patient_id).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_date.between(start_date, end_date),
+        Appointment.status == 'Scheduled')
+
+
+def appointments_query(user_id, role):
+    if role == 'Doctor':
+        window = worklist_window(request.args.get('window'), request.args.get('start'), request.args.get('end'))
+        return doctor_worklist(user_id, *window)
+    # The doctor of each row is joined in the same SELECT so the template
+    # never triggers a lazy User load per appointment.
+    return Appointment.query.options(joinedload(Appointment.doctor)).filter(
+        Appointment.patient_id == user_id)
+
+
+def appointment_page(query, after=None, per_page=APPOINTMENTS_PER_PAGE):
+    """Return one keyset page of appointments ordered by (appointment_date, id) and the cursor of the next page."""
+    if after:
+        after_date, after_id = after
+        query = query.filter(or_(
+            Appointment.appointment_date > after_date,
+            and_(Appointment.appointment_date == after_date, Appointment.id > after_id)))
+    rows = query.order_by(Appointment.appointment_date.asc(), Appointment.id.asc()).limit(per_page + 1).all()
+    if len(rows) > per_page:
+        return rows[:per_page], encode_cursor(rows[per_page - 1])
+    return rows, None
+
+
+@bp.route('/')
 def main():
     return render_template('Home.html')
 
 
-@app.route('/register', methods=['POST', 'GET'])
+@bp.route('/register', methods=['POST', 'GET'])
 def register():
     if request.method == 'POST':
         fullname = request.form['fullname']
@@ -117,6 +496,7 @@ def register():
         blood_group = request.form['blood_group']
         emergency_contact = request.form['emergency_contact']
         image = request.files['image']
+        image_data = image.read() if image else b''
 
         dob = datetime.strptime(dob_str, "%Y-%m-%d").date()
 
@@ -142,39 +522,45 @@ def register():
             errors['blood_group'] = "Select your blood group."
         if not emergency_contact or not emergency_contact.isdigit() or len(emergency_contact) != 10:
             errors['emergency_contact'] = "Enter a valid 10-digit emergency contact."
+        if image_data and image_extension(image_data) is None:
+            errors['image'] = "Please upload a JPEG, PNG, GIF or WebP image."
 
         if not errors:
-            image_url = ''
-            if image:
-                res = cloudinary.uploader.upload(image)
-                image_url = res['secure_url']
+            try:
+                hashed = current_app.extensions['passwords'].hash(password)
+            except HasherBusy:
+                flash(BUSY_MESSAGE, "error")
+                return render_template('register.html', errors=errors, form=request.form), 503
             user = User(
                 fullname=fullname,
                 email=email,
-                password=password,
+                password=hashed,
                 phone=phone,
                 date_of_birth=dob,
                 gender=gender,
                 address=address,
                 blood_group=blood_group,
                 emergency_contact=emergency_contact,
-                image_filename=image_url,
+                image_filename=PLACEHOLDER_IMAGE,
                 role="Patient"
             )
             db.session.add(user)
             db.session.commit()
+            if image_data:
+                current_app.extensions['uploads'].submit(user.id, image_data, image.filename)
 
+            session.regenerate()
             session.permanent = True
             session['id'] = user.id
             session['name'] = user.fullname
             session['role'] = "Patient"
             flash("Registration successful! Please log in to continue.", "success")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return render_template('register.html', errors=errors, form=request.form)
     return render_template('register.html', form={})
 
 
-@app.route('/doctor-register', methods=['GET', 'POST'])
+@bp.route('/doctor-register', methods=['GET', 'POST'])
 def doctor_register():
     if request.method == 'POST':
         fullname = request.form['fullname'].strip()
@@ -187,6 +573,7 @@ def doctor_register():
         blood_group = request.form['blood_group']
         emergency_contact = request.form['emergency_contact'].strip()
         image = request.files['image']
+        image_data = image.read() if image else b''
 
         specialization = request.form['specialization'].strip()
         qualification = request.form['qualification'].strip()
@@ -194,6 +581,7 @@ def doctor_register():
         license_number = request.form['license_number'].strip()
         hospital_name = request.form['hospital_name'].strip()
         bio = request.form.get('bio', '').strip()
+        daily_capacity = request.form.get('daily_capacity', '').strip() or str(DEFAULT_DAILY_CAPACITY)
 
         dob = datetime.strptime(dob_str, "%Y-%m-%d").date()
         emailCheck = User.query.filter_by(email=email).first()
@@ -220,6 +608,8 @@ def doctor_register():
             errors['blood_group'] = "Select your blood group."
         if not emergency_contact or not emergency_contact.isdigit() or len(emergency_contact) != 10:
             errors['emergency_contact'] = "Enter a valid 10-digit emergency contact."
+        if image_data and image_extension(image_data) is None:
+            errors['image'] = "Please upload a JPEG, PNG, GIF or WebP image."
 
         if not specialization:
             errors['specialization'] = "Please enter specialization."
@@ -233,27 +623,32 @@ def doctor_register():
             errors['license_number'] = "This license number is already registered."
         if not hospital_name:
             errors['hospital_name'] = "Please enter hospital or clinic name."
+        if not daily_capacity.isdigit() or int(daily_capacity) < 1:
+            errors['daily_capacity'] = "Please enter the number of appointments you accept per day."
 
         if not errors:
-            image_url = ''
-            if image:
-                res = cloudinary.uploader.upload(image)
-                image_url = res['secure_url']
+            try:
+                hashed = current_app.extensions['passwords'].hash(password)
+            except HasherBusy:
+                flash(BUSY_MESSAGE, "error")
+                return render_template('doctor-register.html', errors=errors, form=request.form), 503
             user = User(
                 fullname=fullname,
                 email=email,
-                password=password,
+                password=hashed,
                 phone=phone,
                 date_of_birth=dob,
                 gender=gender,
                 address=address,
                 blood_group=blood_group,
                 emergency_contact=emergency_contact,
-                image_filename=image_url,
+                image_filename=PLACEHOLDER_IMAGE,
                 role="Doctor"
             )
             db.session.add(user)
             db.session.commit()
+            if image_data:
+                current_app.extensions['uploads'].submit(user.id, image_data, image.filename)
 
             doctor = Doctor(
                 user_id=user.id,
@@ -262,54 +657,64 @@ def doctor_register():
                 experience=experience,
                 license_number=license_number,
                 hospital_name=hospital_name,
-                bio=bio
+                bio=bio,
+                daily_capacity=int(daily_capacity)
             )
             db.session.add(doctor)
             db.session.commit()
+            invalidate_doctor_directory()
 
+            session.regenerate()
             session.permanent = True
             session['id'] = user.id
             session['name'] = user.fullname
             flash("Registration successful, Doctor! Please log in to access your dashboard.", "success")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return render_template('doctor-register.html', errors=errors, form=request.form)
     return render_template('doctor-register.html', form={})
 
 
-@app.route('/login',methods =['POST','GET'])
+@bp.route('/login',methods =['POST','GET'])
 def login():
     if request.method == 'POST':
         identifier = request.form['identifier'].strip()
         password = request.form['password'].strip()
 
         user = User.query.filter((User.email == identifier) | (User.phone == identifier)).first()
+        matches = False
+        if user:
+            try:
+                matches, new_hash = current_app.extensions['passwords'].verify(password, user.password)
+            except HasherBusy:
+                flash(BUSY_MESSAGE, "error")
+                return render_template('login.html', identifier=identifier), 503
+            if new_hash:
+                user.password = new_hash
+                db.session.commit()
 
-        if user and user.password == password:
+        if matches:
+            session.regenerate()
             session.permanent = True
             session['id'] = user.id
             session['name'] = user.fullname
             session['role'] = user.role
             flash("Logged in successfully.","success")
             if user.role == 'Patient':
-                return redirect(url_for('patient', page_name='your-appointments'))
+                return redirect(url_for('main.patient', page_name='your-appointments'))
             if user.role == 'Doctor':
-                return redirect(url_for('doctor',page_name='your-appointments'))
+                return redirect(url_for('main.doctor',page_name='your-appointments'))
         else:
             flash("Invalid login credentials.","error")
             return render_template('login.html', identifier = identifier)
     return render_template('login.html', identifier='', form = {})
 
 
-@app.route('/patient/dashboard/<page_name>')
+@bp.route('/patient/dashboard/<page_name>')
 def patient(page_name):
     user_id = session.get('id')
     if not user_id:
         flash("Session expired. Please log in again.", "warning")
         return redirect('/login')
-    user = User.query.filter_by(id=user_id).first()
-    doctor = User.query.filter_by(role = "doctor").all()
-    appointments = Appointment.query.filter_by(patient_id=user_id).order_by(Appointment.appointment_date.asc()).all()
-    
     pages = {
         'your-appointments': 'your-appointments.html',
         'book-appointments': 'book-appointments.html',
@@ -318,17 +723,47 @@ def patient(page_name):
     if page_name not in pages:
         return "<h1>404 - Page Not Found</h1>", 404
 
+    user = User.query.filter_by(id=user_id).first()
+    doctor = doctor_directory() if page_name == 'book-appointments' else []
+    appointments, next_cursor = [], None
+    if page_name == 'your-appointments':
+        appointments, next_cursor = appointment_page(appointments_query(user_id, 'Patient'))
+    specialization = request.args.get('specialization', '')
+    start = request.args.get('from', '')
+    slots = None
+    if page_name == 'book-appointments' and specialization:
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else date.today()
+        except ValueError:
+            start_date = date.today()
+        slots = find_slots(specialization, start_date, SLOT_RESULTS)
+
     return render_template(pages[page_name],
                             user=user,
                             doctor=doctor,
-                            appointments=appointments)
+                            appointments=appointments,
+                            next_cursor=next_cursor,
+                            specializations=specializations() if page_name == 'book-appointments' else [],
+                            specialization=specialization,
+                            start=start,
+                            slots=slots)
 
 
-@app.route('/patient/dashboard/create-appointment',methods = ['POST','GET'])
+@bp.route('/patient/dashboard/create-appointment',methods = ['POST','GET'])
 def create_appointment():
     if request.method == "POST":
-        doctor = request.form['doctor']
-        appointment_date = request.form['appointment_date']
+        slot = request.form.get('slot')
+        # Both choices carry the doctor's name for the live-update row, so booking
+        # does not look the doctor up again.
+        if slot:
+            # "<doctor id>|<YYYY-MM-DD>|<HH:MM>|<doctor name>" from the slot search results.
+            doctor, appointment_date, appointment_time, doctor_name = slot.split('|', 3)
+        else:
+            # "<doctor id>|<doctor name>" from the doctor list.
+            doctor, _, doctor_name = request.form['doctor'].partition('|')
+            appointment_date = request.form['appointment_date']
+            appointment_time = None
+        doctor = int(doctor)
         appointment_details = request.form['appointment_details']
         patient = user_id = session.get('id')
         if not user_id:
@@ -337,38 +772,56 @@ def create_appointment():
         selected_date = datetime.strptime(appointment_date, '%Y-%m-%d').date()
         if selected_date < date.today():
             flash(" Appointments cannot be scheduled for past dates. Please select today or a future date.", "error")
-            return redirect(url_for('patient', page_name='book-appointments'))
-        count = Appointment.query.filter_by(doctor_id=doctor, appointment_date=appointment_date).count()
-        if count>=10:
-            flash("Cannot place appointment. Doctor already has 10 appointments on this date.","warning")
-            return redirect(url_for('patient', page_name='book-appointments'))
+            return redirect(url_for('main.patient', page_name='book-appointments'))
+        availability = current_app.extensions['availability']
+        if appointment_time:
+            appointment_time = datetime.strptime(appointment_time, '%H:%M').time()
+            if availability.has_started(selected_date, appointment_time):
+                flash("That time slot has already started. Please pick a later one.", "error")
+                return redirect(url_for('main.patient', page_name='book-appointments'))
+            if not availability.is_open(doctor, selected_date, appointment_time):
+                flash("The doctor does not see patients at that time.", "error")
+                return redirect(url_for('main.patient', page_name='book-appointments'))
+        if not reserve_slot(doctor, selected_date):
+            db.session.rollback()
+            availability.forget(doctor, selected_date)
+            flash("Cannot place appointment. Doctor is fully booked on this date.","warning")
+            return redirect(url_for('main.patient', page_name='book-appointments'))
         
         appointment = Appointment(
         patient_id=patient,
         doctor_id=doctor,
-        appointment_date=appointment_date,
+        appointment_date=selected_date,
+        appointment_time=appointment_time,
         appointment_details = appointment_details,
         status = "Scheduled"
         )
         db.session.add(appointment)
-        db.session.commit()
+        try:
+            db.session.flush()
+            search.index_appointment(appointment, db.session.get(User, patient))
+            stats.bump(doctor, selected_date, appointment.status)
+            row = created_row(appointment, session.get('name'), doctor_name)
+            channels = appointment_channels(appointment)
+            db.session.commit()
+        except IntegrityError:
+            # uq_appointments_doctor_slot: someone else took the slot first.
+            db.session.rollback()
+            availability.mark(doctor, selected_date, appointment_time)
+            flash("That time slot was just booked. Please pick another one.", "warning")
+            return redirect(url_for('main.patient', page_name='book-appointments'))
+        availability.mark(doctor, selected_date, appointment_time)
+        publish_created(row, channels)
         flash("Appoinmet booked succesfully.","success")
-        return redirect(url_for('patient', page_name='book-appointments'))
+        return redirect(url_for('main.patient', page_name='book-appointments'))
 
 
-@app.route('/doctor/dashboard/<page_name>')
+@bp.route('/doctor/dashboard/<page_name>')
 def doctor(page_name):
     user_id = session.get('id')
     if not user_id:
         flash("Session expired. Please log in again.", "warning")
         return redirect('/login')
-    user = User.query.options(joinedload(User.doctor_profile)).get(user_id)
-    
-    today = date.today()
-    appointments = Appointment.query.filter(
-    Appointment.status == 'Scheduled',
-    Appointment.appointment_date == today).all()
-    
     pages = {
         'your-appointments': 'your-appointments.html',
         'book-appointments': 'book-appointments.html',
@@ -378,16 +831,163 @@ def doctor(page_name):
     if page_name not in pages:
         return "<h1>404 - Page Not Found</h1>", 404
 
+    user = User.query.options(joinedload(User.doctor_profile)).get(user_id)
+    appointments, next_cursor = [], None
+    if page_name == 'your-appointments':
+        appointments, next_cursor = appointment_page(appointments_query(user_id, 'Doctor'))
+
+    working_hours = summary = None
+    window_dates = worklist_window(request.args.get('window'), request.args.get('start'), request.args.get('end'))
+    if page_name == 'profile':
+        working_hours = current_app.extensions['availability'].weekly_hours(user_id)
+        summary = stats.summary(user_id)
+
     return render_template(pages[page_name],
                             user=user,
-                            appointments=appointments)
+                            appointments=appointments,
+                            next_cursor=next_cursor,
+                            working_hours=working_hours,
+                            stats=summary,
+                            window_dates=window_dates,
+                            weekdays=WEEKDAYS,
+                            window=request.args.get('window', 'today'),
+                            start=request.args.get('start', ''),
+                            end=request.args.get('end', ''))
+
+
+@bp.route('/doctor/working-hours', methods=['POST'])
+def working_hours():
+    user_id = session.get('id')
+    if not user_id or session.get('role') != 'Doctor':
+        flash("Session expired. Please log in again.", "warning")
+        return redirect('/login')
+    try:
+        hours = parse_hours(request.form)
+    except ValueError as exc:
+        flash(str(exc), "error")
+        return redirect(url_for('main.doctor', page_name='profile'))
+    availability = current_app.extensions['availability']
+    availability.set_weekly_hours(user_id, hours)
+    db.session.commit()
+    availability.invalidate_templates()
+    flash("Working hours updated.", "success")
+    return redirect(url_for('main.doctor', page_name='profile'))
+
+
+@bp.route('/doctor/search')
+def search_records():
+    user_id = session.get('id')
+    if not user_id or session.get('role') != 'Doctor':
+        flash("Session expired. Please log in again.", "warning")
+        return redirect('/login')
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = [], False
+    if query:
+        results, has_next = current_app.extensions['search'].search(user_id, query, page, SEARCH_RESULTS_PER_PAGE)
+    return render_template('search.html',
+                            user=db.session.get(User, user_id),
+                            query=query,
+                            results=results,
+                            page=page,
+                            has_next=has_next)
+
+
+@bp.route('/dashboard/appointments/more')
+def more_appointments():
+    user_id = session.get('id')
+    role = session.get('role')
+    if not user_id or not role:
+        return jsonify(error="Session expired. Please log in again."), 401
+    after = decode_cursor(request.args.get('after'))
+    if not after:
+        return jsonify(error="Invalid cursor."), 400
+    appointments, next_cursor = appointment_page(appointments_query(user_id, role), after=after)
+    html = render_template('appointment-rows.html', appointments=appointments, role=role)
+    return jsonify(html=html, next=next_cursor)
+
+
+@bp.route('/events')
+def live_events():
+    if not current_app.config['EVENTS_ENABLED']:
+        return "<h1>404 - Page Not Found</h1>", 404
+    user_id = session.get('id')
+    role = session.get('role')
+    if not user_id or not role:
+        return jsonify(error="Session expired. Please log in again."), 401
+    subscription = current_app.extensions['events'].subscribe(
+        [f"{role.lower()}:{user_id}"], last_id=request.headers.get('Last-Event-ID'))
+    # No stream_with_context: the stream never touches the database, so the
+    # request context (and its connection) is released before it starts.
+    response = Response(events.stream(subscription, current_app.config['EVENTS_HEARTBEAT'],
+                                      current_app.config['EVENTS_MAX_AGE']),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/doctor/appointments/bulk', methods=['POST'])
+@query_budget(None)  # statements grow with the number of days touched, not of appointments
+def bulk_appointments():
+    user_id = session.get('id')
+    if not user_id or session.get('role') != 'Doctor':
+        return jsonify(error="Session expired. Please log in again."), 401
+    payload = request.get_json(silent=True) or {}
+    action, ids = payload.get('action'), payload.get('ids')
+    if action not in BULK_ACTIONS:
+        return jsonify(error=f"action must be one of: {', '.join(BULK_ACTIONS)}."), 400
+    if not isinstance(ids, list) or not 0 < len(ids) <= BULK_MAX_IDS or not all(type(i) is int for i in ids):
+        return jsonify(error=f"ids must be a list of 1 to {BULK_MAX_IDS} appointment ids."), 400
+    ids = sorted(set(ids))
+    operation, status = BULK_ACTIONS[action]
+    try:
+        rows = operation(user_id, ids)
+        db.session.commit()
+    except BulkConflict:
+        db.session.rollback()
+        return jsonify(error="Some of these appointments changed meanwhile. Please try again."), 409
+
+    availability = current_app.extensions['availability']
+    for row in rows:
+        if status == stats.CANCELLED:
+            availability.mark(row.doctor_id, row.appointment_date, row.appointment_time, booked=False)
+        publish_status(row, status)
+    done = {row.id for row in rows}
+    return jsonify(action=action, updated=sorted(done), skipped=[i for i in ids if i not in done])
+
+
+@bp.route('/doctor/export/<fmt>')
+def export_appointments(fmt):
+    user_id = session.get('id')
+    if not user_id or session.get('role') != 'Doctor':
+        flash("Session expired. Please log in again.", "warning")
+        return redirect('/login')
+    if fmt not in exports.FORMATS:
+        return "<h1>404 - Page Not Found</h1>", 404
+    if request.args.get('window'):
+        # Same dates as the worklist the export link was clicked from.
+        start, end = worklist_window(request.args['window'], request.args.get('start'), request.args.get('end'))
+    else:
+        try:
+            start, end = (datetime.strptime(request.args[name], "%Y-%m-%d").date() if request.args.get(name) else None
+                          for name in ('start', 'end'))
+        except ValueError:
+            return "Dates must be YYYY-MM-DD.", 400
+
+    rows = exports.export_rows(start, end, doctor_id=user_id)
+    response = Response(stream_with_context(exports.stream(fmt, rows)), mimetype=exports.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="appointments.{fmt}"'
+    # Keep proxies from buffering the whole export before passing it on.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
-@app.route('/appointment_details/<int:id>')
+@bp.route('/appointment_details/<int:id>')
 def appointment_details(id):
     if 'id' not in session:
         flash("Session expired. Please log in again.", "warning")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     appointment = Appointment.query.filter_by(id=id, ).first()
     prescriptions = Prescription.query.filter_by(appointment_id=id).all()
 
@@ -396,12 +996,12 @@ def appointment_details(id):
                             prescription=prescriptions)
 
 
-@app.route('/app-prescriptions/<int:id>',methods = ['POST','GET'])
+@bp.route('/app-prescriptions/<int:id>',methods = ['POST','GET'])
 def add_prescription(id):
     if request.method == 'POST':
         if 'id' not in session:
             flash("Session expired. Please log in again.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         prescription_details = request.form['prescription']
         appointment = Appointment.query.filter_by(id= id).first()
         doctor_id = appointment.doctor_id
@@ -415,54 +1015,79 @@ def add_prescription(id):
         )
         
         db.session.add(prescription)
+        db.session.flush()
+        search.index_prescription(prescription)
         db.session.commit()
+        publish_prescription(appointment, prescription)
         flash("Thank you, Doctor! Prescription submitted successfully.", "success")
-        return redirect(url_for('appointment_details',id =id))
+        return redirect(url_for('main.appointment_details',id =id))
 
 
-@app.route('/upload',methods =['POST'])
+@bp.route('/upload',methods =['POST'])
 def upload():
     if request.method == 'POST':
-        method = request.form.get('_method')
         user_id = session.get('id')
         role = session.get('role')
         if not user_id or not role:
             flash("Session expired. Please log in again.", "warning")
             return redirect('/login')
-        if method == 'PUT':
-            image_url = request.form['url']
-            image =request.files['profile_picture']
-            public_id = image_url.split('/')[-1].split('.')[0].strip()
-            res = cloudinary.uploader.destroy(public_id)
-            if res["result"] == "ok":
-                res = cloudinary.uploader.upload(image)
-                if res:
-                    user = User.query.filter_by(id=user_id).first()
-                    user.image_filename = res["secure_url"].strip()
-                    db.session.commit()
-                    flash("Profile picture updated.","success")
-                    if role == "Patient":
-                        return redirect(url_for("patient",page_name ="profile"))
-                    else:
-                        return redirect(url_for("doctor", page_name ="profile"))
-                else:
-                    flash("Could not upload image. Something went wrong. Please try again.", "error")
-            else:
-                flash("Could not upload image. Something went wrong. Please try again.", "error")
+        image = request.files.get('profile_picture')
+        image_data = image.read() if image else b''
+        if not image_data:
+            flash("Could not upload image. Something went wrong. Please try again.", "error")
+        elif image_extension(image_data) is None:
+            flash("Please upload a JPEG, PNG, GIF or WebP image.", "error")
         else:
-            image =request.files.get('profile_picture')
-            res = cloudinary.uploader.upload(image)
-            if res:
-                user = User.query.filter_by(id=user_id).first()
-                user.image_filename = res["secure_url"]
-                db.session.commit()
-                flash("Image uploaded successfully.","success")
-            else:
-                flash("Could not upload image. Something went wrong. Please try again.", "error")
-        return redirect(url_for("patient" if role == "Patient" else "doctor", page_name="profile"))
+            # The picture being replaced comes from the database, never from the form,
+            # so a user can only ever have their own old picture deleted.
+            current = db.session.query(User.image_filename).filter_by(id=user_id).scalar()
+            replace_url = current if current and current != PLACEHOLDER_IMAGE else None
+            current_app.extensions['uploads'].submit(user_id, image_data, image.filename, replace_url=replace_url)
+            flash("Your new profile picture is being uploaded and will appear shortly.", "success")
+        return redirect(url_for("main.patient" if role == "Patient" else "main.doctor", page_name="profile"))
+
+
+@bp.route('/media/<filename>')
+def media(filename):
+    # Names are random and never reused, so the bytes behind a URL never change.
+    if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS.values():
+        return "<h1>404 - Page Not Found</h1>", 404
+    response = immutable(send_from_directory(current_app.config['MEDIA_ROOT'], filename, max_age=MEDIA_MAX_AGE))
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+@bp.route('/media/thumbs/<int:size>/<filename>')
+def media_thumbnail(size, filename):
+    media_backend = current_app.extensions['media']
+    if size not in THUMBNAIL_SIZES or not hasattr(media_backend, 'thumbnail'):
+        return "<h1>404 - Page Not Found</h1>", 404
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    try:
+        path = media_backend.thumbnail(secure_filename(filename), size, fmt)
+    except (FileNotFoundError, OSError):
+        return "<h1>404 - Page Not Found</h1>", 404
+    response = immutable(send_file(path, max_age=MEDIA_MAX_AGE))
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.vary.add('Accept')
+    return response
+
+
+@bp.route('/internal/pool-metrics')
+def pool_metrics():
+    if not current_app.config['DB_POOL_METRICS']:
+        return "<h1>404 - Page Not Found</h1>", 404
+    return jsonify(current_app.extensions['pool_monitor'].snapshot())
+
 
+@bp.route('/internal/reminder-metrics')
+def reminder_metrics():
+    if not current_app.config['REMINDER_METRICS']:
+        return "<h1>404 - Page Not Found</h1>", 404
+    return jsonify(current_app.extensions['reminders'].metrics.snapshot())
 
-@app.route('/mark-completed/<int:id>',methods = ['POST','GET'])
+
+@bp.route('/mark-completed/<int:id>',methods = ['POST','GET'])
 def mark_completed(id):
     if request.method == "POST":
         role = session.get('role')
@@ -470,19 +1095,21 @@ def mark_completed(id):
             flash("Session expired. Please log in again.", "warning")
             return redirect('/login')
         appointment = Appointment.query.filter_by(id=id).first()
-        if app:
+        if appointment:
+            stats.move(appointment.doctor_id, appointment.appointment_date, appointment.status, "Completed")
             appointment.status = "Completed"
             db.session.commit()
+            publish_status(appointment, "Completed")
             flash(" Marked as completed. Thank you, Doctor!","success")
         else:
             flash("No such Appointment!!","error")
         if role == "Patient":
-            return redirect(url_for("patient",page_name ="your-appointments"))
+            return redirect(url_for("main.patient",page_name ="your-appointments"))
         else:
-            return redirect(url_for("doctor", page_name ="your-appointments"))
+            return redirect(url_for("main.doctor", page_name ="your-appointments"))
 
 
-@app.route('/cancel-appointment/<int:id>',methods = ['POST','GET'])
+@bp.route('/cancel-appointment/<int:id>',methods = ['POST','GET'])
 def cancel_appointment(id):
     if request.method == 'POST':
         role = session.get('role')
@@ -491,18 +1118,23 @@ def cancel_appointment(id):
             return redirect('/login')
         appointment = Appointment.query.filter_by(id = id).first()
         if appointment:
+            release_slot(appointment.doctor_id, appointment.appointment_date)
+            stats.move(appointment.doctor_id, appointment.appointment_date, appointment.status, stats.CANCELLED)
             db.session.delete(appointment)
             db.session.commit()
+            current_app.extensions['availability'].mark(
+                appointment.doctor_id, appointment.appointment_date, appointment.appointment_time, booked=False)
+            publish_status(appointment, stats.CANCELLED)
             flash("Your Appointment is cancelled succesfully!!","warning")
         else:
             flash("Appointment not found or already deleted.","error")
         if role == "Patient":
-            return redirect(url_for("patient",page_name ="your-appointments"))
+            return redirect(url_for("main.patient",page_name ="your-appointments"))
         else:
-            return redirect(url_for("doctor", page_name ="your-appointments"))
+            return redirect(url_for("main.doctor", page_name ="your-appointments"))
 
 
-@app.route('/delete-appointment/<int:id>',methods = ['POST','GET'])
+@bp.route('/delete-appointment/<int:id>',methods = ['POST','GET'])
 def delete_appointment(id):
     if request.method == 'POST':
         role = session.get('role')
@@ -513,29 +1145,113 @@ def delete_appointment(id):
             appointment = Appointment.query.filter_by(id=id).first()
             if not appointment:
                 flash("Appointment not found or already deleted.", "error")
-                return redirect(url_for("patient",page_name ="your-appointments"))
-
-            prescription = Prescription.query.filter_by(appointment_id=id).first()
-            if prescription:
-                db.session.delete(prescription)
-                db.session.commit()
+                return redirect(url_for("main.patient",page_name ="your-appointments"))
 
+            # Its prescriptions, search documents and reminder go with it (ON DELETE CASCADE).
+            release_slot(appointment.doctor_id, appointment.appointment_date)
+            stats.bump(appointment.doctor_id, appointment.appointment_date, appointment.status, -1)
             db.session.delete(appointment)
             db.session.commit()
+            current_app.extensions['availability'].mark(
+                appointment.doctor_id, appointment.appointment_date, appointment.appointment_time, booked=False)
+            publish_status(appointment, "Deleted")
 
             flash("Your appointment has been deleted successfully!", "success")
         except Exception:
             db.session.rollback()
             flash("An error occurred while cancelling the appointment.", "error")
-        return redirect(url_for("patient",page_name ="your-appointments"))
+        return redirect(url_for("main.patient",page_name ="your-appointments"))
 
 
-@app.route('/logout', methods=['POST'])
+@bp.route('/logout', methods=['POST'])
 def logout():
     if request.method == "POST":
         session.clear()
+        session.regenerate()
         flash("You have been logged out successfully.", "success")
         return redirect('/login')
 
+
+def create_app(config=None, **overrides):
+    """Build the application for a config profile ('development', 'testing' or 'production').
+
+    Nothing here talks to the database unless AUTO_CREATE_SCHEMA is set;
+    engines connect on first use.
+    """
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_mapping(load_config(config))
+    app.config.update(overrides)
+    if not app.config['MEDIA_ROOT']:
+        app.config['MEDIA_ROOT'] = os.path.join(app.instance_path, 'media')
+    if not app.config['ASSETS_CACHE_DIR']:
+        app.config['ASSETS_CACHE_DIR'] = os.path.join(app.instance_path, 'assets')
+    if not app.config['MAIL_FILE_DIR']:
+        app.config['MAIL_FILE_DIR'] = os.path.join(app.instance_path, 'mail')
+
+    if not app.config['SECRET_KEY']:
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY must be set so every worker signs sessions with the same key.")
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    with app.app_context():
+        app.extensions['pool_monitor'] = PoolMonitor(db.engine, slow_wait=app.config['DB_POOL_SLOW_WAIT'])
+        if app.config['SQL_PROFILER']:
+            QueryProfiler(app, db.engine)
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', enable_foreign_keys)
+    app.session_interface = ServerSideSessionInterface(
+        make_store(app.config),
+        cache_ttl=app.config['SESSION_CACHE_TTL'],
+        sweep_interval=app.config['SESSION_SWEEP_INTERVAL'])
+    app.extensions['passwords'] = PasswordHasher(
+        app.config['PASSWORD_SCRYPT_N'], workers=app.config['PASSWORD_HASH_WORKERS'])
+    media_backend = make_backend(app.config)
+    app.extensions['media'] = media_backend
+    app.extensions['uploads'] = UploadQueue(
+        media_backend, on_complete=lambda user_id, url: set_profile_picture(app, user_id, url))
+    app.extensions['doctor_directory'] = {'rows': None, 'expires': 0.0, 'lock': threading.Lock()}
+    app.extensions['search'] = search.make_search(make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name())
+    app.extensions['availability'] = AvailabilityIndex(
+        app.config['SLOT_MINUTES'], ttl=app.config['AVAILABILITY_TTL'], horizon_days=app.config['SLOT_SEARCH_DAYS'])
+    app.extensions['events'] = events.make_broker(app.config)
+    with app.app_context():
+        app.extensions['reminders'] = reminders.Reminders(
+            db.engine, reminders.make_transport(app.config), app.config['MAIL_SENDER'],
+            lead_days=app.config['REMINDER_LEAD_DAYS'], batch_size=app.config['REMINDER_BATCH_SIZE'],
+            workers=app.config['REMINDER_WORKERS'], claim_timeout=app.config['REMINDER_CLAIM_TIMEOUT'])
+    if app.config['REMINDERS_ENABLED']:
+        reminders.ReminderScheduler(app, app.extensions['reminders'], app.config['REMINDER_INTERVAL']).start()
+
+    app.extensions['assets'] = AssetManifest(app.static_folder, app.config['ASSETS_CACHE_DIR'])
+    if app.config['ASSETS_COMPRESS']:
+        app.extensions['assets'].compress()
+
+    app.register_blueprint(bp)
+    app.url_defaults(fingerprint_static)
+    app.view_functions['static'] = static_asset
+    app.add_template_filter(avatar)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(sweep_sessions_command)
+    app.cli.add_command(hash_passwords_command)
+    app.cli.add_command(export_appointments_command)
+    app.cli.add_command(reindex_search_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(check_stats_command)
+    app.cli.add_command(send_reminders_command)
+    app.cli.add_command(build_assets_command)
+
+    if app.config['AUTO_CREATE_SCHEMA']:
+        with app.app_context():
+            migrations.upgrade(db.engine, db.metadata)
+    return app
+
+
 if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        migrations.upgrade(db.engine, db.metadata)
     app.run(debug = True)
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Fingerprinted, precompressed static assets.
+
+``AssetManifest`` hashes every file under the static folder when the app
+is built and maps ``css/main.css`` to ``css/main.3f9a1c2b7d4e.css``.
+``url_for('static', ...)`` returns the fingerprinted name, so a URL
+changes whenever the file does and can be cached for a year as
+``immutable``. Unknown or unhashed names are still served, with the
+normal short cache lifetime.
+
+Text assets get ``.gz`` (and ``.br`` when the ``brotli`` package is
+installed) variants under ASSETS_CACHE_DIR. They are named after the
+content hash, so they are written once per version of a file: at startup
+when ASSETS_COMPRESS is set, or by ``flask build-assets``.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+MIN_COMPRESS_SIZE = 1024
+
+
+class AssetManifest:
+    def __init__(self, root, cache_dir):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.hashed = {}    # logical name -> fingerprinted name
+        self.files = {}     # fingerprinted name -> (logical name, digest)
+        self.scan()
+
+    def scan(self):
+        hashed, files = {}, {}
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                logical = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:12]
+                stem, ext = os.path.splitext(logical)
+                fingerprinted = f"{stem}.{digest}{ext}"
+                hashed[logical] = fingerprinted
+                files[fingerprinted] = (logical, digest)
+        self.hashed, self.files = hashed, files
+
+    def url_name(self, filename):
+        return self.hashed.get(filename, filename)
+
+    def resolve(self, filename):
+        """(logical name, digest) for a fingerprinted name, or None."""
+        return self.files.get(filename)
+
+    def variant(self, logical, digest, encoding):
+        """Path of the precompressed ``encoding`` ('br' or 'gzip') variant, or None when there is none."""
+        suffix = {'br': '.br', 'gzip': '.gz'}[encoding]
+        path = os.path.join(self.cache_dir, f"{digest}-{os.path.basename(logical)}{suffix}")
+        return path if os.path.exists(path) else None
+
+    def compress(self):
+        """Write the missing compressed variants and return how many were written."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        written = 0
+        for logical, digest in self.files.values():
+            if not logical.endswith(COMPRESSIBLE):
+                continue
+            with open(os.path.join(self.root, logical), 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            encoders = {'.gz': lambda raw: gzip.compress(raw, 9, mtime=0)}
+            if brotli is not None:
+                encoders['.br'] = lambda raw: brotli.compress(raw, quality=11)
+            for suffix, encode in encoders.items():
+                path = os.path.join(self.cache_dir, f"{digest}-{os.path.basename(logical)}{suffix}")
+                if os.path.exists(path):
+                    continue
+                encoded = encode(data)
+                if len(encoded) >= len(data):
+                    continue
+                # Write then rename, so workers compressing at the same time never serve half a file.
+                fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(encoded)
+                os.replace(tmp, path)
+                written += 1
+        return written
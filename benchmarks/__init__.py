@@ -0,0 +1,13 @@
+"""Benchmarks and load tests.
+
+    python -m benchmarks.seed --database sqlite:///bench.db --patients 50000 --doctors 500 --appointments 5000000
+    python -m benchmarks.load --database sqlite:///bench.db --requests 2000 --save benchmarks/baseline.json
+    python -m benchmarks.load --database sqlite:///bench.db --compare benchmarks/baseline.json
+    python -m benchmarks.search --database sqlite:///bench.db --queries 200
+    python -m benchmarks.slot_search --doctors 500 --fill 0.8
+    python -m benchmarks.login_cost --costs 4096,16384,65536 --hash-workers 2
+    python -m benchmarks.bulk_status --appointments 200 --days 5
+
+Everything runs offline: the app is built with the testing profile, the
+local media backend and the database given on the command line.
+"""
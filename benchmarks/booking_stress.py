@@ -0,0 +1,92 @@
+"""Concurrent booking stress test for the slot capacity ledger.
+
+Many threads book the same doctor on the same day through the real
+``create_appointment`` route; the run fails if the doctor ends up with
+more appointments than their daily capacity, or if any booking request
+errors instead of redirecting (e.g. a 500 from an exceeded query budget).
+
+    python benchmarks/booking_stress.py --threads 50 --capacity 10
+
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--capacity', type=int, default=10)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db, User, Doctor, Appointment, SlotCapacity
+
+    database_url = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=database_url)
+
+    def make_user(n, role):
+        return User(fullname=f"{role} {n}", email=f"{role.lower()}{n}@stress.test", password="stress@123",
+                    phone=f"{n:010d}", gender="Other", date_of_birth=date(1990, 1, 1), image_filename="",
+                    address="-", blood_group="O+", emergency_contact="0000000000", role=role)
+
+    with app.app_context():
+        doctor = make_user(0, "Doctor")
+        patients = [make_user(n + 1, "Patient") for n in range(args.threads)]
+        db.session.add_all([doctor, *patients])
+        db.session.commit()
+        db.session.add(Doctor(user_id=doctor.id, specialization="Stress", qualification="-", experience="1",
+                              license_number=f"STRESS-{doctor.id}", hospital_name="-",
+                              daily_capacity=args.capacity))
+        db.session.commit()
+        doctor_id, patient_ids = doctor.id, [p.id for p in patients]
+
+    day = date.today().isoformat()
+    barrier = threading.Barrier(args.threads)
+    errors = []
+
+    def book(patient_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['id'] = patient_id
+            sess['role'] = "Patient"
+        barrier.wait()
+        try:
+            res = client.post('/patient/dashboard/create-appointment', data={
+                'doctor': doctor_id, 'appointment_date': day, 'appointment_details': "stress"})
+            if res.status_code != 302:
+                errors.append(res.status_code)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=book, args=(pid,)) for pid in patient_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        booked = Appointment.query.filter_by(doctor_id=doctor_id).count()
+        ledger = SlotCapacity.query.filter_by(doctor_id=doctor_id).one()
+
+    print(f"threads={args.threads} capacity={args.capacity} appointments={booked} "
+          f"ledger_booked={ledger.booked} errors={len(errors)}")
+    if booked > args.capacity or ledger.booked != booked:
+        print("FAIL: doctor overbooked or ledger out of sync")
+        return 1
+    if errors:
+        print(f"FAIL: {len(errors)} bookings failed, first: {errors[0]!r}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Per-row versus bulk status changes for a doctor's appointments.
+
+Books ``--appointments`` Scheduled appointments for one doctor over
+``--days`` days, then completes them through ``/mark-completed/<id>``
+one POST at a time and through one ``/doctor/appointments/bulk`` call,
+and does the same for cancelling. Reports wall time and SQL statements
+(from the profiler's Server-Timing header) for each path.
+
+    python -m benchmarks.bulk_status --appointments 200 --days 5
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from benchmarks.load import QUERIES
+from benchmarks.seed import _insert, build_app, seed
+from models import db, Appointment
+
+DOCTOR_ID = 1
+
+
+def book(patient_id, appointments, days):
+    """Insert fresh Scheduled appointments for the doctor and return their ids."""
+    today = date.today()
+    first = (db.session.query(db.func.max(Appointment.id)).scalar() or 0) + 1
+    _insert(Appointment.__table__, ({
+        'patient_id': patient_id,
+        'doctor_id': DOCTOR_ID,
+        'appointment_date': today + timedelta(days=n % days),
+        'appointment_time': None,
+        'appointment_details': "Bulk benchmark",
+        'status': "Scheduled",
+    } for n in range(appointments)))
+    return list(range(first, first + appointments))
+
+
+def queries(response):
+    return sum(int(n) for n in QUERIES.findall(response.headers.get('Server-Timing', '')))
+
+
+def per_row(client, path, ids):
+    began, statements = time.perf_counter(), 0
+    for appointment_id in ids:
+        response = client.post(path.format(appointment_id))
+        assert response.status_code == 302, response.status_code
+        statements += queries(response)
+    return time.perf_counter() - began, statements
+
+
+def bulk(client, action, ids):
+    began = time.perf_counter()
+    response = client.post('/doctor/appointments/bulk', json={'action': action, 'ids': ids})
+    assert response.status_code == 200 and len(response.get_json()['updated']) == len(ids), response.get_data()
+    return time.perf_counter() - began, queries(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://')
+    parser.add_argument('--appointments', type=int, default=200)
+    parser.add_argument('--days', type=int, default=5, help="days the appointments are spread over")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    app = build_app(args.database)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['id'] = DOCTOR_ID
+        sess['role'] = "Doctor"
+
+    with app.app_context():
+        seed(10, 1, 0, seed=args.seed)
+        patient_id = DOCTOR_ID + 1
+        runs = [
+            ('complete', 'per-row', lambda ids: per_row(client, '/mark-completed/{}', ids)),
+            ('complete', 'bulk', lambda ids: bulk(client, 'complete', ids)),
+            ('cancel', 'per-row', lambda ids: per_row(client, '/cancel-appointment/{}', ids)),
+            ('cancel', 'bulk', lambda ids: bulk(client, 'cancel', ids)),
+        ]
+        print(f"appointments={args.appointments} days={args.days}")
+        for action, path, run in runs:
+            ids = book(patient_id, args.appointments, args.days)
+            seconds, statements = run(ids)
+            print(f"  {action:8} {path:7}  {seconds * 1000:9.1f} ms  {seconds * 1e6 / len(ids):8.1f} us/appt  "
+                  f"{statements:6} queries")
+
+
+if __name__ == "__main__":
+    main()
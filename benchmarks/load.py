@@ -0,0 +1,201 @@
+"""Load test for the main routes with latency percentiles and a JSON baseline.
+
+Drives login, the patient and doctor dashboards, create_appointment and
+appointment_details through the Flask test client from several threads
+against a seeded database. For each scenario it reports p50/p95/p99
+latency, throughput and SQL statements per request (read from the
+profiler's Server-Timing header).
+
+``--save`` writes the results as a baseline. ``--compare`` diffs a run
+against a saved baseline and exits non-zero when a scenario's p95 grows
+by more than ``--tolerance``.
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.seed import PASSWORD, build_app, seed, volumes
+from models import db, Appointment
+
+SCENARIOS = ('login', 'patient_dashboard', 'doctor_dashboard', 'create_appointment', 'appointment_details')
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Workload:
+    def __init__(self, app, rng):
+        self.app = app
+        self.rng = rng
+        with app.app_context():
+            self.patients, self.doctors, self.appointments = volumes()
+            self.max_appointment_id = Appointment.query.order_by(Appointment.id.desc()).first().id
+
+    def patient_id(self):
+        return self.rng.randrange(self.doctors + 1, self.doctors + self.patients + 1)
+
+    def doctor_id(self):
+        return self.rng.randrange(1, self.doctors + 1)
+
+    def client(self, user_id, role):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['id'] = user_id
+            sess['role'] = role
+        return client
+
+    def prepare(self, scenario):
+        """Return a zero-argument callable issuing one request of ``scenario``."""
+        if scenario == 'login':
+            client = self.app.test_client()
+            identifier = f"patient{self.patient_id()}@bench.test"
+            return lambda: client.post('/login', data={'identifier': identifier, 'password': PASSWORD})
+        if scenario == 'patient_dashboard':
+            client = self.client(self.patient_id(), "Patient")
+            return lambda: client.get('/patient/dashboard/your-appointments')
+        if scenario == 'doctor_dashboard':
+            client = self.client(self.doctor_id(), "Doctor")
+            return lambda: client.get('/doctor/dashboard/your-appointments?window=week')
+        if scenario == 'create_appointment':
+            client = self.client(self.patient_id(), "Patient")
+            form = {'doctor': self.doctor_id(),
+                    'appointment_date': (date.today() + timedelta(days=self.rng.randrange(1, 30))).isoformat(),
+                    'appointment_details': "Benchmark booking"}
+            return lambda: client.post('/patient/dashboard/create-appointment', data=form)
+        if scenario == 'appointment_details':
+            with self.app.app_context():
+                appointment = db.session.get(Appointment, self.rng.randrange(1, self.max_appointment_id + 1))
+            client = self.client(appointment.patient_id, "Patient")
+            return lambda: client.get(f'/appointment_details/{appointment.id}')
+        raise ValueError(scenario)
+
+
+def run_scenario(workload, scenario, requests, workers):
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+    per_worker = [requests // workers + (1 if i < requests % workers else 0) for i in range(workers)]
+
+    def worker(count):
+        for _ in range(count):
+            with lock:
+                call = workload.prepare(scenario)
+            start = time.perf_counter()
+            response = call()
+            elapsed = time.perf_counter() - start
+            match = QUERIES.search(response.headers.get('Server-Timing', ''))
+            with lock:
+                latencies.append(elapsed)
+                if match:
+                    queries.append(int(match.group(1)))
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in per_worker]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+
+    ms = [v * 1000 for v in latencies]
+    return {
+        'requests': len(ms),
+        'errors': len(errors),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'throughput_rps': round(len(ms) / wall, 1),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print per-scenario deltas against ``baseline``; return True when no p95 regressed past ``tolerance``."""
+    ok = True
+    for scenario, now in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(scenario)
+        if not before:
+            print(f"  {scenario:<20} (not in baseline)")
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        flag = ""
+        if change > tolerance:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"  {scenario:<20} p95 {before['p95_ms']:9.2f} -> {now['p95_ms']:9.2f} ms ({change:+.0%}) "
+              f"queries {before['queries_per_request']} -> {now['queries_per_request']}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite:///bench.db')
+    parser.add_argument('--patients', type=int, default=5000, help="rows to seed when the database is empty")
+    parser.add_argument('--doctors', type=int, default=100)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--save', metavar='PATH', help="write results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed p95 growth, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    app = build_app(args.database)
+    with app.app_context():
+        if not any(volumes()):
+            print(f"Seeding {args.patients} patients, {args.doctors} doctors, {args.appointments} appointments...")
+            seed(args.patients, args.doctors, args.appointments, seed=args.seed)
+        patients, doctors, appointments = volumes()
+
+    workload = Workload(app, random.Random(args.seed))
+    results = {
+        'meta': {
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+            'patients': patients,
+            'doctors': doctors,
+            'appointments': appointments,
+            'requests_per_scenario': args.requests,
+            'workers': args.workers,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'scenarios': {},
+    }
+    print(f"patients={patients} doctors={doctors} appointments={appointments} workers={args.workers}")
+    for scenario in args.scenarios.split(','):
+        stats = run_scenario(workload, scenario, args.requests, args.workers)
+        results['scenarios'][scenario] = stats
+        print(f"  {scenario:<20} p50={stats['p50_ms']:8.2f} p95={stats['p95_ms']:8.2f} p99={stats['p99_ms']:8.2f} ms "
+              f"{stats['throughput_rps']:8.1f} req/s  queries={stats['queries_per_request']}  errors={stats['errors']}")
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print(f"Compared with {args.compare}:")
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
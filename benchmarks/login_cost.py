@@ -0,0 +1,86 @@
+"""Login throughput at each scrypt cost setting.
+
+For every PASSWORD_SCRYPT_N value it builds the app, stores one hashed
+user and drives POST /login from several threads, reporting p50/p95
+latency and logins per second. Run it with and without the process pool
+(``--hash-workers 0`` hashes on the request thread) to see how much of
+the cost the pool takes off the serving threads.
+
+    python -m benchmarks.login_cost --costs 4096,16384,65536 --hash-workers 2 --threads 8
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import date
+
+from benchmarks.load import percentile
+from benchmarks.seed import PASSWORD
+from models import db, User
+
+
+def build_app(cost, hash_workers):
+    from app import create_app
+    return create_app('testing', SQL_QUERY_BUDGET=None, SESSION_BACKEND='local-redis',
+                      PASSWORD_SCRYPT_N=cost, PASSWORD_HASH_WORKERS=hash_workers)
+
+
+def run(cost, hash_workers, threads, logins):
+    app = build_app(cost, hash_workers)
+    with app.app_context():
+        db.session.add(User(fullname="Login Bench", email="login@bench.test", phone="9000000000",
+                            password=app.extensions['passwords'].hash(PASSWORD), gender="Other",
+                            date_of_birth=date(1990, 1, 1), image_filename='', address="1 Benchmark Street",
+                            blood_group="O+", emergency_contact="9999999999", role="Patient"))
+        db.session.commit()
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = [logins // threads + (1 if i < logins % threads else 0) for i in range(threads)]
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.post('/login', data={'identifier': "login@bench.test", 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+                if response.status_code != 302:
+                    errors.append(response.status_code)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+    wall = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - wall
+    app.extensions['passwords'].shutdown()
+
+    return {
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'mean_ms': statistics.fmean(latencies),
+        'logins_per_s': len(latencies) / wall,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--costs', default='4096,16384,65536', help="comma-separated scrypt N values")
+    parser.add_argument('--hash-workers', type=int, default=2, help="process pool size, 0 = inline")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=200, help="logins per cost setting")
+    args = parser.parse_args()
+
+    print(f"hash_workers={args.hash_workers} threads={args.threads} logins={args.logins}")
+    for cost in (int(c) for c in args.costs.split(',')):
+        stats = run(cost, args.hash_workers, args.threads, args.logins)
+        print(f"  N={cost:<8} p50={stats['p50_ms']:8.2f} p95={stats['p95_ms']:8.2f} ms "
+              f"{stats['logins_per_s']:8.1f} logins/s  errors={stats['errors']}")
+
+
+if __name__ == "__main__":
+    main()
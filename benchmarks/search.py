@@ -0,0 +1,69 @@
+"""Full-text search latency against a LIKE scan on the same documents.
+
+Seeds (or reuses) a database, rebuilds the search documents, and runs the
+same doctor-scoped queries through the database's full-text backend and
+through ``LikeSearch``. Queries mix common words from appointment reasons
+and prescriptions with selective patient-name and phone lookups.
+
+    python -m benchmarks.search --database sqlite:///bench.db --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.load import percentile
+from benchmarks.seed import MEDICINES, REASONS, build_app, seed, volumes
+import search
+from models import db
+
+WORDS = sorted({word for text in REASONS + MEDICINES for word in search.terms(text) if len(word) > 3})
+
+
+def random_query(rng, doctors, patients):
+    kind = rng.randrange(3)
+    if kind == 0:
+        return ' '.join(rng.sample(WORDS, rng.choice((1, 2))))
+    patient = rng.randrange(doctors + 1, doctors + patients + 1)
+    if kind == 1:
+        return f"patient {patient}"
+    return str(9000000000 + patient)[:8]
+
+
+def timed(backend, doctor_id, query):
+    start = time.perf_counter()
+    rows, _ = backend.search(doctor_id, query)
+    return (time.perf_counter() - start) * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite:///bench.db')
+    parser.add_argument('--patients', type=int, default=5000, help="rows to seed when the database is empty")
+    parser.add_argument('--doctors', type=int, default=100)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = build_app(args.database)
+    with app.app_context():
+        if not any(volumes()):
+            seed(args.patients, args.doctors, args.appointments, seed=args.seed)
+        patients, doctors, appointments = volumes()
+        with db.engine.begin() as conn:
+            search.rebuild(conn)
+        workload = [(rng.randrange(1, doctors + 1), random_query(rng, doctors, patients))
+                    for _ in range(args.queries)]
+        backends = {'fulltext': app.extensions['search'], 'like': search.LikeSearch()}
+        print(f"appointments={appointments} doctors={doctors} queries={args.queries}")
+        for name, backend in backends.items():
+            samples = [timed(backend, doctor_id, query) for doctor_id, query in workload]
+            ms = [elapsed for elapsed, _ in samples]
+            print(f"  {name:<9} p50={percentile(ms, 50):8.2f} p95={percentile(ms, 95):8.2f} ms  "
+                  f"mean hits/page={statistics.fmean(hits for _, hits in samples):.1f}")
+
+
+if __name__ == "__main__":
+    main()
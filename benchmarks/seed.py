@@ -0,0 +1,146 @@
+"""Synthetic hospital data generator.
+
+Fills users, doctors, appointments and prescriptions with deterministic
+fake data, inserted in large executemany batches through Core so that
+millions of rows load in minutes. Appointments span the past year and
+the next two months. Past appointments are mostly Completed, and a share
+of those have a prescription.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from flask import current_app
+
+from models import db, User, Doctor, Appointment, Prescription
+
+BATCH = 10000
+PASSWORD = "Bench@1234"
+SPECIALIZATIONS = ("Cardiology", "Dermatology", "Neurology", "Orthopedics", "Pediatrics",
+                   "Psychiatry", "Radiology", "General Medicine", "ENT", "Oncology")
+REASONS = ("Fever and cough", "Back pain", "Routine check-up", "Headache for a week", "Skin rash",
+           "Follow-up visit", "Chest pain on exertion", "Joint pain", "Allergy symptoms", "Blood test review")
+MEDICINES = ("Paracetamol 500mg twice daily", "Ibuprofen 400mg after meals", "Cetirizine 10mg at night",
+             "Amoxicillin 500mg thrice daily for 5 days", "Rest and hydration", "Vitamin D3 weekly")
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(table, rows):
+    for batch in _batches(rows):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+
+
+def user_row(n, role, rng, password):
+    return {
+        'id': n,
+        'fullname': f"{role} {n}",
+        'email': f"{role.lower()}{n}@bench.test",
+        'password': password,
+        'phone': f"{9000000000 + n}",
+        'gender': rng.choice(("Male", "Female", "Other")),
+        'date_of_birth': date(1950, 1, 1) + timedelta(days=rng.randrange(20000)),
+        'image_filename': '',
+        'address': f"{n} Benchmark Street",
+        'blood_group': rng.choice(("A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-")),
+        'emergency_contact': "9999999999",
+        'role': role,
+    }
+
+
+def seed(patients, doctors, appointments, seed=7, prescription_rate=0.6):
+    """Insert the requested volumes into an empty database. Call inside an app context."""
+    rng = random.Random(seed)
+    today = date.today()
+    # One hash shared by every synthetic user keeps seeding fast.
+    password = current_app.extensions['passwords'].hash(PASSWORD)
+    doctor_ids = range(1, doctors + 1)
+    patient_ids = range(doctors + 1, doctors + patients + 1)
+
+    _insert(User.__table__, (user_row(n, "Doctor", rng, password) for n in doctor_ids))
+    _insert(User.__table__, (user_row(n, "Patient", rng, password) for n in patient_ids))
+    _insert(Doctor.__table__, ({
+        'user_id': n,
+        'specialization': SPECIALIZATIONS[n % len(SPECIALIZATIONS)],
+        'qualification': "MBBS, MD",
+        'experience': str(rng.randrange(1, 35)),
+        'license_number': f"BENCH-{n}",
+        'hospital_name': f"Benchmark Hospital {n % 20}",
+        'bio': None,
+        'daily_capacity': 1000000,
+    } for n in doctor_ids))
+
+    prescriptions = []
+
+    def appointment_rows():
+        for n in range(1, appointments + 1):
+            day = today + timedelta(days=rng.randrange(-365, 60))
+            status = "Scheduled"
+            if day < today and rng.random() < 0.85:
+                status = "Completed"
+            row = {
+                'id': n,
+                'patient_id': rng.choice(patient_ids),
+                'doctor_id': rng.choice(doctor_ids),
+                'appointment_date': day,
+                'appointment_details': rng.choice(REASONS),
+                'status': status,
+            }
+            if status == "Completed" and rng.random() < prescription_rate:
+                prescriptions.append({
+                    'appointment_id': n,
+                    'patient_id': row['patient_id'],
+                    'doctor_id': row['doctor_id'],
+                    'prescriptions': rng.choice(MEDICINES),
+                })
+            yield row
+
+    for batch in _batches(appointment_rows()):
+        db.session.execute(Appointment.__table__.insert(), batch)
+        if prescriptions:
+            db.session.execute(Prescription.__table__.insert(), prescriptions)
+            prescriptions.clear()
+        db.session.commit()
+
+
+def volumes():
+    """(patients, doctors, appointments) currently in the database."""
+    return (User.query.filter_by(role="Patient").count(),
+            User.query.filter_by(role="Doctor").count(),
+            Appointment.query.count())
+
+
+def build_app(database):
+    from app import create_app
+    return create_app('testing', SQLALCHEMY_DATABASE_URI=database, SQL_QUERY_BUDGET=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite:///bench.db')
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--doctors', type=int, default=100)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    app = build_app(args.database)
+    with app.app_context():
+        if any(volumes()):
+            parser.error(f"{args.database} already holds data; seed into an empty database")
+        seed(args.patients, args.doctors, args.appointments, seed=args.seed)
+        print("patients=%d doctors=%d appointments=%d" % volumes())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Latency of "next N free slots in a specialization" on the availability index.
+
+Seeds doctors (spread over the seed module's specializations) and books
+a share of their time slots over the next weeks, then times
+``AvailabilityIndex.free_slots`` for random specializations and start
+dates. The first search of each week loads bitmaps from the database;
+the warm numbers are what a worker serves once its cache is filled.
+
+    python -m benchmarks.slot_search --doctors 500 --fill 0.8 --searches 2000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.load import percentile
+from benchmarks.seed import SPECIALIZATIONS, _insert, build_app, seed
+from models import Appointment
+from scheduling import slot_time
+
+
+def book_slots(app, doctors, patients, days, fill, rng):
+    """Book ``fill`` of every doctor's open slots for ``days`` days from today."""
+    index = app.extensions['availability']
+    today = date.today()
+
+    def rows():
+        n = 0
+        for doctor_id in range(1, doctors + 1):
+            template = index.template(doctor_id)
+            for offset in range(days):
+                day = today + timedelta(days=offset)
+                mask = template[day.weekday()]
+                for slot in range(mask.bit_length()):
+                    if mask >> slot & 1 and rng.random() < fill:
+                        n += 1
+                        yield {
+                            'patient_id': rng.randrange(doctors + 1, doctors + patients + 1),
+                            'doctor_id': doctor_id,
+                            'appointment_date': day,
+                            'appointment_time': slot_time(slot, index.slot_minutes),
+                            'appointment_details': "Benchmark booking",
+                            'status': "Scheduled",
+                        }
+
+    _insert(Appointment.__table__, rows())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://')
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=21, help="days ahead to pre-book")
+    parser.add_argument('--fill', type=float, default=0.8, help="share of open slots already booked")
+    parser.add_argument('--results', type=int, default=10, help="slots asked for per search")
+    parser.add_argument('--searches', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = build_app(args.database)
+    with app.app_context():
+        seed(args.patients, args.doctors, 0, seed=args.seed)
+        book_slots(app, args.doctors, args.patients, args.days, args.fill, rng)
+        index = app.extensions['availability']
+        by_specialization = {name: [n for n in range(1, args.doctors + 1)
+                                    if SPECIALIZATIONS[n % len(SPECIALIZATIONS)] == name]
+                             for name in SPECIALIZATIONS}
+        # A fixed "now" keeps runs comparable whatever the time of day.
+        now = datetime.combine(date.today(), datetime.min.time())
+
+        def search():
+            doctor_ids = by_specialization[rng.choice(SPECIALIZATIONS)]
+            start = now.date() + timedelta(days=rng.randrange(args.days))
+            began = time.perf_counter()
+            found = index.free_slots(doctor_ids, start, args.results, now=now)
+            return (time.perf_counter() - began) * 1e6, len(found)
+
+        cold = [search()[0] for _ in range(len(SPECIALIZATIONS))]
+        warm, found = zip(*(search() for _ in range(args.searches)))
+
+    print(f"doctors={args.doctors} per_specialization~{args.doctors // len(SPECIALIZATIONS)} "
+          f"fill={args.fill:.0%} results={args.results}")
+    print(f"  cold  median={statistics.median(cold):9.1f} us")
+    print(f"  warm  p50={percentile(warm, 50):9.1f} us  p95={percentile(warm, 95):9.1f} us  "
+          f"p99={percentile(warm, 99):9.1f} us  mean slots found={statistics.fmean(found):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Cold-start benchmark: import time, app build time and time to first request.
+
+Each run happens in a fresh interpreter, the way a new gunicorn worker or a
+test session starts.
+
+    python benchmarks/startup.py --runs 10 --profile production
+
+No database is contacted unless the profile sets AUTO_CREATE_SCHEMA.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app(sys.argv[1], SQLALCHEMY_DATABASE_URI='sqlite://', SECRET_KEY='startup-benchmark')
+t2 = time.perf_counter()
+status = app.test_client().get('/').status_code
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2, 'status': status}))
+"""
+
+
+def run_once(profile):
+    out = subprocess.run([sys.executable, '-c', PROBE, profile], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', default='production')
+    args = parser.parse_args()
+
+    samples = [run_once(args.profile) for _ in range(args.runs)]
+    print(f"profile={args.profile} runs={args.runs}")
+    for phase in ('import', 'create_app', 'first_request'):
+        values = [s[phase] * 1000 for s in samples]
+        print(f"  {phase:<14} median={statistics.median(values):8.2f} ms  min={min(values):8.2f} ms")
+    total = [(s['import'] + s['create_app'] + s['first_request']) * 1000 for s in samples]
+    print(f"  {'total':<14} median={statistics.median(total):8.2f} ms  min={min(total):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Configuration profiles for ``create_app``.
+
+Pick one with ``create_app('production')`` or the APP_ENV environment
+variable. Every profile except ``testing`` lets the environment (or the
+.env file) override its defaults, so deployment settings such as
+DATABASE_URL and the Cloudinary credentials never live in code.
+"""
+import os
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    SECRET_KEY = None
+    SQLALCHEMY_DATABASE_URI = None
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool, per worker process. Ignored for SQLite.
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+    DB_POOL_TIMEOUT = 30
+    # Checkouts waiting longer than this (seconds) are logged.
+    DB_POOL_SLOW_WAIT = 0.1
+    # Expose /internal/pool-metrics.
+    DB_POOL_METRICS = False
+    # Per-request SQL profiling (query count, DB time, Server-Timing header).
+    SQL_PROFILER = False
+    SQL_SLOW_QUERY_MS = 100
+    SQL_PROFILER_TOP = 3
+    # Max statements per request; views can override with @query_budget.
+    SQL_QUERY_BUDGET = None
+    # Server-side sessions: 'database', 'redis' (needs SESSION_REDIS_URL and
+    # the redis package) or 'local-redis' (in-process stand-in).
+    SESSION_BACKEND = 'database'
+    SESSION_REDIS_URL = None
+    SESSION_CACHE_TTL = 2.0
+    SESSION_SWEEP_INTERVAL = 300
+    # Live appointment events over /events. Off by default: every open
+    # stream holds a worker thread, so enable it only with threaded or
+    # gevent workers. Backend 'local' (one worker) or 'redis' (needs
+    # EVENTS_REDIS_URL and the redis package). Streams send a keep-alive
+    # comment every EVENTS_HEARTBEAT seconds and close after EVENTS_MAX_AGE
+    # seconds; browsers then reconnect and catch up.
+    EVENTS_ENABLED = False
+    EVENTS_BACKEND = 'local'
+    EVENTS_REDIS_URL = None
+    EVENTS_HEARTBEAT = 15.0
+    EVENTS_MAX_AGE = 300.0
+    # scrypt cost (a power of two; each doubling doubles CPU and memory per
+    # hash) and the size of the process pool that runs it. 0 = inline.
+    PASSWORD_SCRYPT_N = 2 ** 14
+    PASSWORD_HASH_WORKERS = 2
+    DOCTOR_DIRECTORY_TTL = 300
+    # Appointment reminders. REMINDERS_ENABLED starts the scheduler thread
+    # in every worker; claims keep them from sending twice. Otherwise run
+    # `flask send-reminders` from cron.
+    REMINDERS_ENABLED = False
+    REMINDER_INTERVAL = 3600
+    REMINDER_LEAD_DAYS = 1
+    REMINDER_BATCH_SIZE = 500
+    REMINDER_WORKERS = 4
+    REMINDER_CLAIM_TIMEOUT = 900
+    # Expose /internal/reminder-metrics.
+    REMINDER_METRICS = False
+    # Mail: 'smtp' or 'file' (writes .eml files to MAIL_FILE_DIR, default
+    # instance/mail).
+    MAIL_BACKEND = 'smtp'
+    MAIL_SERVER = 'localhost'
+    MAIL_PORT = 25
+    MAIL_USERNAME = None
+    MAIL_PASSWORD = None
+    MAIL_USE_TLS = False
+    MAIL_SENDER = 'MediCare <no-reply@medicare.local>'
+    MAIL_FILE_DIR = None
+    # Length of a bookable time slot, how long each worker caches booked
+    # slots, and how many days ahead a slot search looks.
+    SLOT_MINUTES = 30
+    AVAILABILITY_TTL = 30
+    SLOT_SEARCH_DAYS = 60
+    # Compressed variants of the static files, written at startup when
+    # ASSETS_COMPRESS is set (otherwise by `flask build-assets`).
+    ASSETS_CACHE_DIR = None
+    ASSETS_COMPRESS = True
+    MEDIA_BACKEND = 'cloudinary'
+    MEDIA_ROOT = None
+    MEDIA_URL = '/media'
+    CLOUDINARY_CLOUD_NAME = None
+    CLOUDINARY_API_KEY = None
+    CLOUDINARY_API_SECRET = None
+    # Run pending migrations while the app is built. Off by default so
+    # workers never touch the schema on startup; use `flask migrate`.
+    AUTO_CREATE_SCHEMA = False
+    READ_ENV = True
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    READ_ENV = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    MEDIA_BACKEND = 'local'
+    AUTO_CREATE_SCHEMA = True
+    SQL_PROFILER = True
+    SQL_QUERY_BUDGET = 15
+    MAIL_BACKEND = 'file'
+    ASSETS_COMPRESS = False
+    PASSWORD_SCRYPT_N = 2 ** 10
+    PASSWORD_HASH_WORKERS = 0
+
+
+class ProductionConfig(Config):
+    pass
+
+
+profiles = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+# environment variable -> (config key, parser)
+ENVIRONMENT = {
+    'SECRET_KEY': ('SECRET_KEY', str),
+    'DATABASE_URL': ('SQLALCHEMY_DATABASE_URI', str),
+    'CLOUDINARY_CLOUD_NAME': ('CLOUDINARY_CLOUD_NAME', str),
+    'CLOUDINARY_API_KEY': ('CLOUDINARY_API_KEY', str),
+    'CLOUDINARY_API_SECRET': ('CLOUDINARY_API_SECRET', str),
+    'DOCTOR_DIRECTORY_TTL': ('DOCTOR_DIRECTORY_TTL', int),
+    'SLOT_MINUTES': ('SLOT_MINUTES', int),
+    'AVAILABILITY_TTL': ('AVAILABILITY_TTL', float),
+    'SLOT_SEARCH_DAYS': ('SLOT_SEARCH_DAYS', int),
+    'REMINDERS_ENABLED': ('REMINDERS_ENABLED', _flag),
+    'REMINDER_INTERVAL': ('REMINDER_INTERVAL', int),
+    'REMINDER_LEAD_DAYS': ('REMINDER_LEAD_DAYS', int),
+    'REMINDER_BATCH_SIZE': ('REMINDER_BATCH_SIZE', int),
+    'REMINDER_WORKERS': ('REMINDER_WORKERS', int),
+    'REMINDER_CLAIM_TIMEOUT': ('REMINDER_CLAIM_TIMEOUT', int),
+    'REMINDER_METRICS': ('REMINDER_METRICS', _flag),
+    'MAIL_BACKEND': ('MAIL_BACKEND', str),
+    'MAIL_SERVER': ('MAIL_SERVER', str),
+    'MAIL_PORT': ('MAIL_PORT', int),
+    'MAIL_USERNAME': ('MAIL_USERNAME', str),
+    'MAIL_PASSWORD': ('MAIL_PASSWORD', str),
+    'MAIL_USE_TLS': ('MAIL_USE_TLS', _flag),
+    'MAIL_SENDER': ('MAIL_SENDER', str),
+    'MAIL_FILE_DIR': ('MAIL_FILE_DIR', str),
+    'ASSETS_CACHE_DIR': ('ASSETS_CACHE_DIR', str),
+    'ASSETS_COMPRESS': ('ASSETS_COMPRESS', _flag),
+    'MEDIA_BACKEND': ('MEDIA_BACKEND', str),
+    'MEDIA_ROOT': ('MEDIA_ROOT', str),
+    'AUTO_CREATE_SCHEMA': ('AUTO_CREATE_SCHEMA', _flag),
+    'DB_POOL_SIZE': ('DB_POOL_SIZE', int),
+    'DB_MAX_OVERFLOW': ('DB_MAX_OVERFLOW', int),
+    'DB_POOL_RECYCLE': ('DB_POOL_RECYCLE', int),
+    'DB_POOL_PRE_PING': ('DB_POOL_PRE_PING', _flag),
+    'DB_POOL_TIMEOUT': ('DB_POOL_TIMEOUT', float),
+    'DB_POOL_SLOW_WAIT': ('DB_POOL_SLOW_WAIT', float),
+    'DB_POOL_METRICS': ('DB_POOL_METRICS', _flag),
+    'SESSION_BACKEND': ('SESSION_BACKEND', str),
+    'SESSION_REDIS_URL': ('SESSION_REDIS_URL', str),
+    'SESSION_CACHE_TTL': ('SESSION_CACHE_TTL', float),
+    'EVENTS_ENABLED': ('EVENTS_ENABLED', _flag),
+    'EVENTS_BACKEND': ('EVENTS_BACKEND', str),
+    'EVENTS_REDIS_URL': ('EVENTS_REDIS_URL', str),
+    'EVENTS_HEARTBEAT': ('EVENTS_HEARTBEAT', float),
+    'EVENTS_MAX_AGE': ('EVENTS_MAX_AGE', float),
+    'PASSWORD_SCRYPT_N': ('PASSWORD_SCRYPT_N', int),
+    'PASSWORD_HASH_WORKERS': ('PASSWORD_HASH_WORKERS', int),
+    'SQL_PROFILER': ('SQL_PROFILER', _flag),
+    'SQL_SLOW_QUERY_MS': ('SQL_SLOW_QUERY_MS', float),
+    'SQL_QUERY_BUDGET': ('SQL_QUERY_BUDGET', int),
+}
+
+
+def load_config(name=None):
+    """Settings of profile ``name`` (default: APP_ENV, then 'development') as a dict."""
+    name = name or os.getenv('APP_ENV') or 'development'
+    if name not in profiles:
+        raise ValueError(f"Unknown config profile {name!r}; expected one of {', '.join(profiles)}")
+    profile = profiles[name]
+    settings = {key: getattr(profile, key) for key in dir(profile) if key.isupper()}
+    if profile.READ_ENV:
+        for variable, (key, parse) in ENVIRONMENT.items():
+            value = os.getenv(variable)
+            if value:
+                settings[key] = parse(value)
+    return settings
@@ -0,0 +1,235 @@
+"""Live appointment events pushed to browsers over Server-Sent Events.
+
+Views publish an event after their transaction commits, addressed to
+channels such as ``doctor:7`` or ``patient:42``. ``EventBroker`` fans
+events out to the SSE streams subscribed in this process. Each stream
+reads from its own bounded queue. A short per-channel history lets a
+reconnecting browser catch up from its ``Last-Event-ID``. The history of a
+channel nobody subscribes to is dropped once its last event is
+``history_ttl`` seconds old, so it does not grow with every user who ever
+had an event.
+
+Workers only see each other's events through a cross-process backend,
+chosen with EVENTS_BACKEND:
+
+* ``local``: in-process only. Fine for a single worker.
+* ``redis``: publishes to Redis pub/sub, and each process relays what it
+  receives to its own subscribers. Needs EVENTS_REDIS_URL and the
+  ``redis`` package.
+
+Live updates are off unless EVENTS_ENABLED is set. Each stream occupies a
+worker thread while it is open, so they need a threaded or gevent server;
+EVENTS_MAX_AGE caps how long one stream stays open.
+
+Event types are ``appointment.created``, ``appointment.status`` and
+``prescription.added``.
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        """The event in SSE wire format."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+    def dumps(self):
+        return json.dumps({'id': self.id, 'type': self.type, 'data': self.data})
+
+    @classmethod
+    def loads(cls, raw):
+        fields = json.loads(raw)
+        return cls(fields['id'], fields['type'], fields['data'])
+
+
+class Subscription:
+    def __init__(self, broker, channels, size):
+        self.broker = broker
+        self.channels = channels
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client; end its stream and let it catch up from the history on reconnect.
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next event, or None when ``timeout`` seconds pass without one."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBackend:
+    def start(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, event):
+        self.broker.deliver(channel, event)
+
+
+class RedisBackend:
+    def __init__(self, client, prefix='events:'):
+        self.client = client
+        self.prefix = prefix
+        self._listener = None
+
+    def start(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, event):
+        self.client.publish(self.prefix + channel, event.dumps())
+
+    def listen(self):
+        # Started with the first subscriber, so each forked worker runs its own.
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._relay, name='events-relay', daemon=True)
+            self._listener.start()
+
+    def _relay(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self.broker.deliver(channel[len(self.prefix):], Event.loads(message['data']))
+            except Exception:
+                log.exception("Event relay lost its Redis connection; reconnecting")
+                time.sleep(1)
+
+
+class EventBroker:
+    def __init__(self, backend=None, history=50, queue_size=100, history_ttl=900.0):
+        self.backend = backend or LocalBackend()
+        self.backend.start(self)
+        self.history = history
+        self.queue_size = queue_size
+        self.history_ttl = history_ttl
+        self._subscribers = {}   # channel -> set of Subscription
+        self._history = {}       # channel -> deque of Event
+        self._last_event = {}    # channel -> monotonic time of its last event
+        self._next_prune = time.monotonic() + history_ttl
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def _next_id(self):
+        # Time-ordered so ids from different processes still sort.
+        return f"{time.time_ns()}-{next(self._sequence)}"
+
+    def publish(self, channels, type, data):
+        event = Event(self._next_id(), type, data)
+        for channel in channels:
+            self.backend.publish(channel, event)
+        return event
+
+    def deliver(self, channel, event):
+        now = time.monotonic()
+        with self._lock:
+            history = self._history.setdefault(channel, deque(maxlen=self.history))
+            history.append(event)
+            self._last_event[channel] = now
+            if now >= self._next_prune:
+                self._prune(now)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def _prune(self, now):
+        """Drop the history of idle channels without subscribers. Called with the lock held."""
+        cutoff = now - self.history_ttl
+        for channel, last in list(self._last_event.items()):
+            if last < cutoff and channel not in self._subscribers:
+                del self._history[channel], self._last_event[channel]
+        self._next_prune = now + self.history_ttl
+
+    def subscribe(self, channels, last_id=None):
+        """Subscribe to ``channels``, first replaying history newer than ``last_id``."""
+        if hasattr(self.backend, 'listen'):
+            self.backend.listen()
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+            if last_id:
+                missed = sorted((event for channel in channels for event in self._history.get(channel, ())
+                                 if _sort_key(event.id) > _sort_key(last_id)), key=lambda e: _sort_key(e.id))
+                for event in missed:
+                    subscription.offer(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+
+def _sort_key(event_id):
+    stamp, _, sequence = event_id.partition('-')
+    try:
+        return int(stamp), int(sequence or 0)
+    except ValueError:
+        return 0, 0
+
+
+def make_broker(config):
+    backend = config['EVENTS_BACKEND']
+    # Keep history long enough for a stream that hit EVENTS_MAX_AGE to reconnect and catch up.
+    history_ttl = max(900.0, 3 * config['EVENTS_MAX_AGE'])
+    if backend == 'local':
+        return EventBroker(history_ttl=history_ttl)
+    if backend == 'redis':
+        import redis  # optional dependency, only needed for this backend
+        return EventBroker(RedisBackend(redis.Redis.from_url(config['EVENTS_REDIS_URL'])), history_ttl=history_ttl)
+    raise ValueError(f"Unknown EVENTS_BACKEND {backend!r}")
+
+
+def stream(subscription, heartbeat=15.0, max_age=300.0):
+    """SSE body for ``subscription``: events as they arrive, a comment line every ``heartbeat`` seconds.
+
+    The stream ends after ``max_age`` seconds so it never holds a worker
+    for good; the browser reconnects after ``retry`` and catches up from
+    its Last-Event-ID.
+    """
+    deadline = time.monotonic() + max_age
+    try:
+        yield "retry: 3000\n\n"
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = subscription.get(min(heartbeat, remaining))
+            yield event.encode() if event else ": ping\n\n"
+    finally:
+        subscription.close()
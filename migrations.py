@@ -0,0 +1,173 @@
+"""Versioned schema migrations.
+
+Migrations are applied in version order, each in its own transaction, and
+the applied versions are recorded in the ``schema_version`` table. Every
+step checks the live schema before changing it, so databases created by
+the old ``db.create_all()`` at import time upgrade cleanly.
+
+Indexes are declared once on the models; migrations create them by name.
+On MySQL they are built with ``ALGORITHM=INPLACE, LOCK=NONE`` so the table
+stays readable and writable while the index is built.
+
+    flask --app app migrate
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+import search
+import stats
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version", version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def create_index(conn, metadata, table_name, index_name):
+    table = metadata.tables[table_name]
+    index = next(i for i in table.indexes if i.name == index_name)
+    if index_name in {i['name'] for i in inspect(conn).get_indexes(table_name)}:
+        return
+    if conn.dialect.name == 'mysql':
+        unique = 'UNIQUE ' if index.unique else ''
+        columns = ', '.join(c.name for c in index.columns)
+        conn.execute(text(
+            f"CREATE {unique}INDEX {index_name} ON {table_name} ({columns}) ALGORITHM=INPLACE LOCK=NONE"))
+    else:
+        index.create(conn)
+
+
+def add_column(conn, metadata, table_name, column_name, ddl):
+    if column_name in {c['name'] for c in inspect(conn).get_columns(table_name)}:
+        return
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+def cascade_foreign_key(conn, metadata, table_name, column_name, referred_table):
+    """Make the foreign key on ``column_name`` ON DELETE CASCADE, in place on MySQL.
+
+    Returns False when it already cascades.
+    SQLite cannot alter a constraint, so the table is rebuilt from the
+    model: renamed aside, created again, refilled and dropped. Callers
+    recreate anything else that hung off the old table, such as triggers.
+    """
+    fk = next(fk for fk in inspect(conn).get_foreign_keys(table_name)
+              if fk['referred_table'] == referred_table and fk['constrained_columns'] == [column_name])
+    if (fk.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+        return False
+    # Rows orphaned by older code paths would make the new constraint fail.
+    conn.execute(text(f"DELETE FROM {table_name} WHERE {column_name} NOT IN (SELECT id FROM {referred_table})"))
+    if conn.dialect.name == 'sqlite':
+        table = metadata.tables[table_name]
+        old = f"{table_name}_old"
+        conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {old}"))
+        for index in inspect(conn).get_indexes(old):
+            conn.execute(text(f"DROP INDEX {index['name']}"))
+        table.create(conn)
+        columns = ', '.join(c.name for c in table.columns)
+        conn.execute(text(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {old}"))
+        conn.execute(text(f"DROP TABLE {old}"))
+    else:
+        conn.execute(text(f"ALTER TABLE {table_name} DROP FOREIGN KEY {fk['name']}"))
+        conn.execute(text(f"ALTER TABLE {table_name} ADD CONSTRAINT {fk['name']} FOREIGN KEY ({column_name}) "
+                          f"REFERENCES {referred_table} (id) ON DELETE CASCADE"))
+    return True
+
+
+@migration(1, "create base tables")
+def create_tables(conn, metadata):
+    metadata.create_all(conn, tables=[metadata.tables[name] for name in
+                                      ('users', 'doctors', 'appointments', 'prescriptions', 'slot_capacity')])
+
+
+@migration(2, "per-doctor daily capacity")
+def doctor_capacity(conn, metadata):
+    add_column(conn, metadata, 'doctors', 'daily_capacity', "INTEGER NOT NULL DEFAULT 10")
+
+
+@migration(3, "indexes for login, registration and dashboard lookups")
+def lookup_indexes(conn, metadata):
+    create_index(conn, metadata, 'users', 'ix_users_phone')
+    create_index(conn, metadata, 'appointments', 'ix_appointments_patient_date')
+    create_index(conn, metadata, 'appointments', 'ix_appointments_doctor_date_status')
+    create_index(conn, metadata, 'prescriptions', 'ix_prescriptions_appointment_id')
+
+
+@migration(4, "server-side session store")
+def session_store(conn, metadata):
+    metadata.tables['sessions'].create(conn, checkfirst=True)
+
+
+@migration(5, "time slots and working hours")
+def time_slots(conn, metadata):
+    add_column(conn, metadata, 'appointments', 'appointment_time', "TIME NULL")
+    create_index(conn, metadata, 'appointments', 'uq_appointments_doctor_slot')
+    metadata.tables['working_hours'].create(conn, checkfirst=True)
+
+
+@migration(6, "full-text search documents")
+def search_documents(conn, metadata):
+    table = metadata.tables['search_documents']
+    if not inspect(conn).has_table('search_documents'):
+        table.create(conn)
+        search.backfill(conn)
+    search.make_search(conn.dialect.name).create(conn)
+
+
+@migration(7, "per-doctor daily statistics")
+def doctor_daily_stats(conn, metadata):
+    if not inspect(conn).has_table('doctor_daily_stats'):
+        metadata.tables['doctor_daily_stats'].create(conn)
+        stats.rebuild(conn)
+
+
+@migration(8, "appointment reminders")
+def appointment_reminders(conn, metadata):
+    create_index(conn, metadata, 'appointments', 'ix_appointments_date_status')
+    metadata.tables['appointment_reminders'].create(conn, checkfirst=True)
+
+
+@migration(9, "cascade appointment deletes to prescriptions, search documents and reminders")
+def cascade_appointment_deletes(conn, metadata):
+    for table_name in ('prescriptions', 'appointment_reminders'):
+        cascade_foreign_key(conn, metadata, table_name, 'appointment_id', 'appointments')
+    if cascade_foreign_key(conn, metadata, 'search_documents', 'appointment_id', 'appointments'):
+        # The rebuilt table lost the full-text triggers.
+        search.make_search(conn.dialect.name).create(conn)
+
+
+def current_version(conn):
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc())).scalar() or 0
+
+
+def upgrade(engine, metadata):
+    """Apply every pending migration and return the list of versions applied."""
+    version_metadata.create_all(engine)
+    with engine.connect() as conn:
+        version = current_version(conn)
+    applied = []
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            fn(conn, metadata)
+            conn.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.utcnow()))
+        applied.append(number)
+    return applied
@@ -0,0 +1,164 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Date, DateTime, String, Text, Time, ForeignKey
+from datetime import date, datetime, time
+
+db = SQLAlchemy()
+
+DEFAULT_DAILY_CAPACITY = 10
+
+class User(db.Model):
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    fullname: Mapped[str] = mapped_column(String(50), nullable=False)
+    email: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
+    password: Mapped[str] = mapped_column(String(128), nullable=False)  
+    phone: Mapped[str] = mapped_column(String(20), nullable=False)
+
+    gender: Mapped[str] = mapped_column(String(10), nullable=False)
+    date_of_birth: Mapped[date] = mapped_column(Date(), nullable=False)
+    image_filename: Mapped[str] = mapped_column(String(100)) 
+    address: Mapped[str] = mapped_column(String(200), nullable=False)
+    
+    blood_group: Mapped[str] = mapped_column(String(5), nullable=False)
+    emergency_contact: Mapped[str] = mapped_column(String(20), nullable=False)
+    role: Mapped[str] = mapped_column(String(10), nullable=False)  
+    
+    doctor_profile: Mapped["Doctor"] = relationship("Doctor", back_populates="user", uselist=False)
+
+    __table_args__ = (
+        db.Index('ix_users_phone', 'phone', unique=True),
+    )
+
+class Appointment(db.Model):
+    __tablename__ = "appointments"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    
+    patient_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    
+    appointment_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Start of the booked slot; NULL for bookings made for a whole day.
+    appointment_time: Mapped[time] = mapped_column(Time, nullable=True)
+    appointment_details:Mapped[str] = mapped_column(String(200), nullable=False)
+    status:Mapped[str] = mapped_column(String(200), nullable=False)
+    
+    patient: Mapped["User"] = relationship("User", foreign_keys=[patient_id], backref="patient_appointments")
+    doctor: Mapped["User"] = relationship("User", foreign_keys=[doctor_id], backref="doctor_appointments")
+    # Deleting an appointment deletes its prescriptions in the database
+    # (ON DELETE CASCADE); passive_deletes keeps the ORM from loading them first.
+    prescriptions: Mapped[list["Prescription"]] = relationship(
+        "Prescription", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_appointments_doctor_date_status', 'doctor_id', 'appointment_date', 'status'),
+        db.Index('ix_appointments_patient_date', 'patient_id', 'appointment_date', 'id'),
+        # One appointment per doctor and time slot. Whole-day bookings have a
+        # NULL time and are not constrained.
+        db.Index('uq_appointments_doctor_slot', 'doctor_id', 'appointment_date', 'appointment_time', unique=True),
+        # Reminder runs scan one date range across every doctor.
+        db.Index('ix_appointments_date_status', 'appointment_date', 'status'),
+    )
+
+class Prescription(db.Model):
+    __tablename__ = "prescriptions"
+    
+    id: Mapped[int] = mapped_column(primary_key = True)
+    
+    appointment_id: Mapped[int] = mapped_column(ForeignKey('appointments.id', ondelete='CASCADE'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    
+    prescriptions :Mapped[str] = mapped_column(String(200),nullable = True)
+    
+    patient: Mapped["User"] = relationship("User", foreign_keys=[patient_id], backref="patient_prescriptions")
+    doctor: Mapped["User"] = relationship("User", foreign_keys=[doctor_id], backref="doctor_prescriptions")
+
+    __table_args__ = (
+        db.Index('ix_prescriptions_appointment_id', 'appointment_id'),
+    )
+    
+    def __repr__(self):
+        return f"<User {self.id}: {self.fullname}>"
+
+class Doctor(db.Model):
+    __tablename__ = "doctors"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, unique=True)
+    specialization: Mapped[str] = mapped_column(String(100), nullable=False)
+    qualification: Mapped[str] = mapped_column(String(100), nullable=False)
+    experience: Mapped[str] = mapped_column(String(10), nullable=False)
+    license_number: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
+    hospital_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    bio: Mapped[str] = mapped_column(String(300), nullable=True)
+    daily_capacity: Mapped[int] = mapped_column(nullable=False, default=DEFAULT_DAILY_CAPACITY)
+
+    user: Mapped["User"] = relationship("User", back_populates="doctor_profile")
+
+class SlotCapacity(db.Model):
+    __tablename__ = "slot_capacity"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    appointment_date: Mapped[date] = mapped_column(Date, nullable=False)
+    capacity: Mapped[int] = mapped_column(nullable=False)
+    booked: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'appointment_date', name='uq_slot_capacity_doctor_date'),
+    )
+
+class WorkingHours(db.Model):
+    __tablename__ = "working_hours"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    weekday: Mapped[int] = mapped_column(nullable=False)  # 0 = Monday
+    start_time: Mapped[time] = mapped_column(Time, nullable=False)
+    end_time: Mapped[time] = mapped_column(Time, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'weekday', name='uq_working_hours_doctor_weekday'),
+    )
+
+class SearchDocument(db.Model):
+    __tablename__ = "search_documents"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    appointment_id: Mapped[int] = mapped_column(ForeignKey('appointments.id', ondelete='CASCADE'), nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # 'appointment' or 'prescription'
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_search_documents_appointment_id', 'appointment_id'),
+        db.Index('ix_search_documents_doctor_id', 'doctor_id'),
+    )
+
+class DoctorDailyStats(db.Model):
+    __tablename__ = "doctor_daily_stats"
+
+    doctor_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+class StoredSession(db.Model):
+    __tablename__ = "sessions"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+class AppointmentReminder(db.Model):
+    __tablename__ = "appointment_reminders"
+
+    # One row per appointment; inserting it claims the reminder for one node.
+    appointment_id: Mapped[int] = mapped_column(ForeignKey('appointments.id', ondelete='CASCADE'), primary_key=True)
+    claimed_by: Mapped[str] = mapped_column(String(100), nullable=False)
+    claimed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
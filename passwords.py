@@ -0,0 +1,115 @@
+"""Salted scrypt password hashing, run off the request thread.
+
+Hashes are stored as ``scrypt$<n>$<r>$<p>$<salt>$<hash>`` (base64 parts),
+so the cost can be raised later without invalidating old rows. A row whose
+parameters differ from the configured cost, or a legacy plaintext row, is
+rehashed the next time its owner logs in. ``flask hash-passwords`` converts
+every remaining plaintext row.
+
+Hashing costs tens of milliseconds of CPU, so ``PasswordHasher`` runs it in
+a bounded process pool (PASSWORD_HASH_WORKERS). A login storm then queues
+there instead of holding the GIL of the threads serving other requests.
+With 0 workers it runs inline, which is what the tests use. The pool's
+processes are started with forkserver (spawn where that is unavailable),
+never forked from a web worker that already runs background threads.
+When a job does not finish within the timeout, or the pool breaks,
+``HasherBusy`` is raised so the view can ask the user to try again.
+"""
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+PREFIX = 'scrypt'
+R = 8
+P = 1
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode()
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+
+
+def hash_password(password, n):
+    salt = os.urandom(16)
+    return f"{PREFIX}${n}${R}${P}${_b64(salt)}${_b64(_scrypt(password, salt, n, R, P))}"
+
+
+def verify_password(password, stored):
+    if not stored.startswith(PREFIX + '$'):
+        # Plaintext row from before passwords were hashed.
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, n, r, p, salt, expected = stored.split('$')
+    actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(actual, base64.b64decode(expected))
+
+
+def needs_rehash(stored, n):
+    if not stored.startswith(PREFIX + '$'):
+        return True
+    _, cost, r, p, _, _ = stored.split('$')
+    return (int(cost), int(r), int(p)) != (n, R, P)
+
+
+def verify_and_upgrade(password, stored, n):
+    """Return (matches, new_hash); new_hash is set when the stored hash should be replaced."""
+    if not verify_password(password, stored):
+        return False, None
+    return True, hash_password(password, n) if needs_rehash(stored, n) else None
+
+
+class HasherBusy(Exception):
+    """The pool did not hash or verify in time (queue included), or it broke."""
+
+
+def _context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    def __init__(self, n, workers=2, timeout=10):
+        self.n = n
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Created on first use so it is started inside each web worker.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy(f"password hashing took longer than {self.timeout}s")
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None  # the next call starts a fresh pool
+            raise HasherBusy("password hashing pool broke")
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.n)
+
+    def verify(self, password, stored):
+        return self._run(verify_and_upgrade, password, stored, self.n)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
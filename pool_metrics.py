@@ -0,0 +1,122 @@
+"""Connection pool settings and health metrics.
+
+``engine_options`` turns the DB_POOL_* settings into SQLAlchemy engine
+options. ``PoolMonitor`` listens to the pool events of one engine and
+keeps running counters: checkouts, connections opened, invalidations
+(stale connections caught by pre-ping), and how long requests waited
+for a connection. ``TimedQueuePool`` reports those wait times.
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited to its monitor."""
+
+    monitor = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            if self.monitor:
+                self.monitor.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.monitor:
+            self.monitor.record_wait(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        return pool
+
+
+def engine_options(config):
+    """Engine options for SQLALCHEMY_ENGINE_OPTIONS. SQLite keeps Flask-SQLAlchemy's own pool setup."""
+    if (config.get('SQLALCHEMY_DATABASE_URI') or '').startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+
+
+class PoolMonitor:
+    def __init__(self, engine, slow_wait=0.1):
+        self.engine = engine
+        self.slow_wait = slow_wait
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.monitor = self
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+        if timed_out or seconds >= self.slow_wait:
+            log.warning("db pool wait %.1f ms%s %s", seconds * 1000,
+                        " (timed out)" if timed_out else "", self.engine.pool.status())
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                'pool_class': type(pool).__name__,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'wait_count': self.waits,
+                'wait_avg_ms': round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'timeouts': self.timeouts,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(),
+                         checked_in=pool.checkedin(), overflow=max(pool.overflow(), 0))
+        return stats
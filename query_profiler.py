@@ -0,0 +1,103 @@
+"""Opt-in per-request SQL profiler.
+
+Hooks ``before_cursor_execute``/``after_cursor_execute`` on the engine and
+tallies, for every Flask request, how many statements ran, the total
+time spent in the database and the slowest statements. Each response
+gets a ``Server-Timing: db;dur=...`` header and one structured log line.
+
+Statements slower than SQL_SLOW_QUERY_MS are logged on their own. A
+request issuing more than SQL_QUERY_BUDGET statements (or the budget set
+on its view with ``@query_budget``) raises ``QueryBudgetExceeded`` when
+the app is testing, so N+1 regressions fail the suite. Outside tests it
+is logged as an error.
+"""
+import heapq
+import json
+import logging
+import time
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Set a per-view statement budget that overrides SQL_QUERY_BUDGET."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryProfiler:
+    def __init__(self, app=None, engine=None):
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['query_profiler'] = self
+
+    def _start(self):
+        g.sql_stats = {'count': 0, 'total': 0.0, 'slowest': []}
+
+    # The start time lives on the statement's execution context, which is
+    # discarded with it, so a statement that raises leaves nothing behind.
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiler_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_profiler_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        stats = g.get('sql_stats') if has_app_context() else None
+        if stats is None:
+            return
+        stats['count'] += 1
+        stats['total'] += elapsed
+        entry = (elapsed, stats['count'], statement)
+        if len(stats['slowest']) < current_app.config['SQL_PROFILER_TOP']:
+            heapq.heappush(stats['slowest'], entry)
+        else:
+            heapq.heappushpop(stats['slowest'], entry)
+        if elapsed * 1000 >= current_app.config['SQL_SLOW_QUERY_MS']:
+            log.warning("slow query %.1f ms on %s %s: %s", elapsed * 1000, request.method, request.path,
+                        " ".join(statement.split()))
+
+    def _finish(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        db_ms = stats['total'] * 1000
+        response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats["count"]} queries"')
+        log.info(json.dumps({
+            'event': 'sql_profile',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': stats['count'],
+            'db_ms': round(db_ms, 3),
+            'slowest': [{'ms': round(elapsed * 1000, 3), 'sql': " ".join(statement.split())}
+                        for elapsed, _, statement in sorted(stats['slowest'], reverse=True)],
+        }))
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', current_app.config['SQL_QUERY_BUDGET'])
+        if budget is not None and stats['count'] > budget:
+            message = (f"{request.method} {request.path} issued {stats['count']} queries, "
+                       f"over its budget of {budget}")
+            if current_app.testing:
+                raise QueryBudgetExceeded(message)
+            log.error(message)
+        return response
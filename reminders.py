@@ -0,0 +1,282 @@
+"""Batched reminders for upcoming appointments.
+
+``ReminderScheduler`` wakes once per REMINDER_INTERVAL, aligned to the
+wall clock so every node runs in the same window, and calls
+``Reminders.run``. A run selects ``Scheduled`` appointments in the next
+REMINDER_LEAD_DAYS days that have no reminder yet, using
+ix_appointments_date_status, and works through them in batches of
+REMINDER_BATCH_SIZE:
+
+* claim: insert one ``appointment_reminders`` row per appointment. The
+  primary key makes the insert fail for anything another node or an
+  earlier run already claimed, so each reminder goes out once.
+* batch: one message per patient, listing all of their claimed
+  appointments.
+* deliver: REMINDER_WORKERS threads send the messages through the
+  transport, then stamp ``sent_at``. Failed messages release their claims
+  and are retried next window.
+
+A claim that is never stamped (the node died mid-run) can be taken over
+after REMINDER_CLAIM_TIMEOUT seconds. A node that dies after sending but
+before stamping may therefore cause one duplicate reminder.
+
+Transports are chosen with MAIL_BACKEND: ``smtp`` (MAIL_SERVER, ...)
+or ``file``, which writes each message as an .eml file under
+MAIL_FILE_DIR instead of sending it.
+
+    flask --app app send-reminders
+"""
+import json
+import logging
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from models import Appointment, AppointmentReminder, User
+
+log = logging.getLogger(__name__)
+
+reminders = AppointmentReminder.__table__
+
+
+class SMTPTransport:
+    def __init__(self, host, port=25, username=None, password=None, use_tls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, message):
+        # One connection per message keeps the worker threads independent.
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class FileTransport:
+    """Writes each message to ``directory`` as an .eml file instead of sending it."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message):
+        path = os.path.join(self.directory, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml")
+        with open(path, 'wb') as f:
+            f.write(message.as_bytes())
+
+
+def make_transport(config):
+    backend = config['MAIL_BACKEND']
+    if backend == 'smtp':
+        return SMTPTransport(config['MAIL_SERVER'], config['MAIL_PORT'], config['MAIL_USERNAME'],
+                             config['MAIL_PASSWORD'], use_tls=config['MAIL_USE_TLS'])
+    if backend == 'file':
+        return FileTransport(config['MAIL_FILE_DIR'])
+    raise ValueError(f"Unknown MAIL_BACKEND {backend!r}")
+
+
+class ReminderMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.selected = 0
+        self.claimed = 0
+        self.skipped = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.last_run = None
+
+    def record_run(self, run):
+        with self._lock:
+            self.runs += 1
+            self.selected += run['selected']
+            self.claimed += run['claimed']
+            self.skipped += run['skipped']
+            self.messages_sent += run['messages_sent']
+            self.messages_failed += run['messages_failed']
+            self.last_run = run
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'selected': self.selected,
+                'claimed': self.claimed,
+                'skipped': self.skipped,
+                'messages_sent': self.messages_sent,
+                'messages_failed': self.messages_failed,
+                'last_run': self.last_run,
+            }
+
+
+class Reminders:
+    def __init__(self, engine, transport, sender, lead_days=1, batch_size=500, workers=4, claim_timeout=900,
+                 node=None):
+        self.engine = engine
+        self.transport = transport
+        self.sender = sender
+        self.lead_days = lead_days
+        self.batch_size = batch_size
+        self.workers = workers
+        self.claim_timeout = claim_timeout
+        self.node = node or f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics = ReminderMetrics()
+
+    def due(self, conn, today, after_id, stale_before):
+        """Next batch of unreminded appointments, ordered by id, with the claim they may take over."""
+        patient = aliased(User)
+        doctor = aliased(User)
+        return conn.execute(
+            select(Appointment.id, Appointment.appointment_date, Appointment.appointment_time,
+                   Appointment.patient_id, patient.email, patient.fullname,
+                   doctor.fullname.label('doctor_name'), reminders.c.claimed_at)
+            .join(patient, patient.id == Appointment.patient_id)
+            .join(doctor, doctor.id == Appointment.doctor_id)
+            .outerjoin(reminders, reminders.c.appointment_id == Appointment.id)
+            .where(Appointment.appointment_date.between(today, today + timedelta(days=self.lead_days)),
+                   Appointment.status == 'Scheduled',
+                   Appointment.id > after_id,
+                   or_(reminders.c.appointment_id.is_(None),
+                       and_(reminders.c.sent_at.is_(None), reminders.c.claimed_at < stale_before)))
+            .order_by(Appointment.id)
+            .limit(self.batch_size)
+        ).all()
+
+    def claim(self, rows, now):
+        """Claim reminders for ``rows`` and return the rows this node won."""
+        fresh = [row for row in rows if row.claimed_at is None]
+        stale = [row for row in rows if row.claimed_at is not None]
+        won = []
+        try:
+            with self.engine.begin() as conn:
+                if fresh:
+                    conn.execute(insert(reminders), [
+                        {'appointment_id': row.id, 'claimed_by': self.node, 'claimed_at': now} for row in fresh])
+            won.extend(fresh)
+        except IntegrityError:
+            # Another node claimed some of them; fall back to one insert each.
+            for row in fresh:
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(insert(reminders).values(appointment_id=row.id, claimed_by=self.node,
+                                                              claimed_at=now))
+                    won.append(row)
+                except IntegrityError:
+                    pass
+        for row in stale:
+            # Compare-and-set on the old claim time: only one node takes it over.
+            with self.engine.begin() as conn:
+                taken = conn.execute(
+                    update(reminders)
+                    .where(reminders.c.appointment_id == row.id, reminders.c.sent_at.is_(None),
+                           reminders.c.claimed_at == row.claimed_at)
+                    .values(claimed_by=self.node, claimed_at=now)).rowcount
+            if taken:
+                won.append(row)
+        return won
+
+    def compose(self, rows):
+        """One reminder message per patient covering all of ``rows``."""
+        lines = [f"- {row.appointment_date.strftime('%d-%m-%Y')}"
+                 f"{' ' + row.appointment_time.strftime('%H:%M') if row.appointment_time else ''}"
+                 f" with Dr. {row.doctor_name}" for row in rows]
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = rows[0].email
+        message['Subject'] = "Your upcoming appointment" + ("s" if len(rows) > 1 else "")
+        message.set_content(f"Hello {rows[0].fullname},\n\nThis is a reminder of your upcoming "
+                            f"appointment{'s' if len(rows) > 1 else ''}:\n\n" + "\n".join(lines) +
+                            "\n\nIf you cannot attend, please cancel from your dashboard.\n\nMediCare\n")
+        return message
+
+    def deliver(self, rows):
+        """Send one message and stamp its reminders; release them when sending fails."""
+        ids = [row.id for row in rows]
+        try:
+            self.transport.send(self.compose(rows))
+        except Exception:
+            log.exception("Reminder to patient %s failed; it will be retried next run", rows[0].patient_id)
+            with self.engine.begin() as conn:
+                conn.execute(delete(reminders).where(reminders.c.appointment_id.in_(ids),
+                                                     reminders.c.claimed_by == self.node))
+            return False
+        with self.engine.begin() as conn:
+            conn.execute(update(reminders).where(reminders.c.appointment_id.in_(ids))
+                         .values(sent_at=datetime.utcnow()))
+        return True
+
+    def run(self, today=None):
+        """Send every reminder due today and return the run's metrics."""
+        today = today or date.today()
+        started = time.perf_counter()
+        run = {'selected': 0, 'claimed': 0, 'skipped': 0, 'messages_sent': 0, 'messages_failed': 0}
+        after_id = 0
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix='reminders') as pool:
+            while True:
+                now = datetime.utcnow()
+                with self.engine.connect() as conn:
+                    rows = self.due(conn, today, after_id, now - timedelta(seconds=self.claim_timeout))
+                if not rows:
+                    break
+                after_id = rows[-1].id
+                won = self.claim(rows, now)
+                run['selected'] += len(rows)
+                run['claimed'] += len(won)
+                run['skipped'] += len(rows) - len(won)
+                # A patient whose appointments straddle two batches gets two messages.
+                by_patient = OrderedDict()
+                for row in won:
+                    by_patient.setdefault(row.patient_id, []).append(row)
+                for sent in pool.map(self.deliver, by_patient.values()):
+                    run['messages_sent' if sent else 'messages_failed'] += 1
+        elapsed = time.perf_counter() - started
+        run.update(seconds=round(elapsed, 3),
+                   messages_per_second=round(run['messages_sent'] / elapsed, 1) if elapsed else 0.0,
+                   finished_at=datetime.utcnow().isoformat(timespec='seconds'))
+        self.metrics.record_run(run)
+        log.info(json.dumps({'reminders': run}))
+        return run
+
+
+class ReminderScheduler:
+    """Runs ``reminders.run`` in a daemon thread at the start of every ``interval``-second window."""
+
+    def __init__(self, app, reminders, interval):
+        self.app = app
+        self.reminders = reminders
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval - time.time() % self.interval):
+            try:
+                with self.app.app_context():
+                    self.reminders.run()
+            except Exception:
+                log.exception("Reminder run failed")
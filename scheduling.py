@@ -0,0 +1,242 @@
+"""Time slots, working hours and the in-process availability index.
+
+A day is cut into SLOT_MINUTES slots counted from midnight, so slot ``i``
+starts at ``i * SLOT_MINUTES`` minutes. Each doctor has a weekly
+working-hours template (``working_hours`` rows, or DEFAULT_HOURS when the
+doctor has none), kept as one bitmap per weekday with bit ``i`` set when
+slot ``i`` is open. Booked slots are bitmaps per (doctor, day) built
+from ``appointments.appointment_time``; a day whose capacity ledger is
+full counts as fully booked.
+
+Free slots are then ``template & ~booked``, so "next N free slots in a
+specialization from date D" is a handful of integer operations per
+doctor and day once the bitmaps are loaded. Booked bitmaps are cached per
+process for AVAILABILITY_TTL seconds and loaded a week at a time for all
+doctors of a specialization in one query. Bookings and cancellations in
+this worker update the cache at once; other workers see them when their
+copy expires. The unique slot index on ``appointments`` is what actually
+prevents double booking, so a stale bitmap can only offer a slot that then
+fails to book.
+"""
+import threading
+import time as clock
+from datetime import datetime, time, timedelta
+
+from models import db, Appointment, SlotCapacity, WorkingHours
+
+# Monday to Friday, 09:00-17:00.
+DEFAULT_HOURS = {weekday: (time(9, 0), time(17, 0)) for weekday in range(5)}
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+LOAD_DAYS = 7
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def hours_mask(start, end, slot_minutes):
+    """Bitmap of the slots lying entirely inside [start, end)."""
+    first = -(-_minutes(start) // slot_minutes)
+    last = _minutes(end) // slot_minutes
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def slot_index(value, slot_minutes):
+    """Slot starting at ``value``, or None when ``value`` is not on the slot grid."""
+    minutes = _minutes(value)
+    if value.second or minutes % slot_minutes:
+        return None
+    return minutes // slot_minutes
+
+
+def slot_time(index, slot_minutes):
+    minutes = index * slot_minutes
+    return time(minutes // 60, minutes % 60)
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class AvailabilityIndex:
+    def __init__(self, slot_minutes=30, ttl=30.0, horizon_days=60):
+        self.slot_minutes = slot_minutes
+        self.ttl = ttl
+        self.horizon_days = horizon_days
+        self.full_day = (1 << (24 * 60 // slot_minutes)) - 1
+        self.default_template = tuple(hours_mask(*DEFAULT_HOURS[d], slot_minutes) if d in DEFAULT_HOURS else 0
+                                      for d in range(7))
+        self._templates = None
+        self._templates_expire = 0.0
+        self._booked = {}   # (doctor_id, day) -> (bitmap, expires)
+        self._lock = threading.Lock()
+
+    # -- working hours -----------------------------------------------------
+
+    def templates(self):
+        """{doctor_id: (monday_mask, ..., sunday_mask)} for doctors with their own hours."""
+        templates = self._templates
+        if templates is not None and clock.monotonic() < self._templates_expire:
+            return templates
+        with self._lock:
+            if self._templates is None or clock.monotonic() >= self._templates_expire:
+                loaded = {}
+                for row in db.session.query(WorkingHours.doctor_id, WorkingHours.weekday,
+                                            WorkingHours.start_time, WorkingHours.end_time):
+                    masks = loaded.setdefault(row.doctor_id, [0] * 7)
+                    masks[row.weekday] = hours_mask(row.start_time, row.end_time, self.slot_minutes)
+                self._templates = {doctor_id: tuple(masks) for doctor_id, masks in loaded.items()}
+                self._templates_expire = clock.monotonic() + self.ttl
+            return self._templates
+
+    def template(self, doctor_id):
+        return self.templates().get(doctor_id) or self.default_template
+
+    def invalidate_templates(self):
+        with self._lock:
+            self._templates = None
+
+    # -- bookings ----------------------------------------------------------
+
+    def _load(self, doctor_ids, start):
+        """Load booked bitmaps of ``doctor_ids`` for LOAD_DAYS days from ``start`` in one pass."""
+        end = start + timedelta(days=LOAD_DAYS - 1)
+        masks = {(doctor_id, start + timedelta(days=n)): 0
+                 for doctor_id in doctor_ids for n in range(LOAD_DAYS)}
+        booked = db.session.query(Appointment.doctor_id, Appointment.appointment_date,
+                                  Appointment.appointment_time).filter(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.appointment_date.between(start, end),
+            Appointment.appointment_time.isnot(None))
+        for doctor_id, day, at in booked:
+            index = slot_index(at, self.slot_minutes)
+            if index is not None:
+                masks[(doctor_id, day)] |= 1 << index
+        full = db.session.query(SlotCapacity.doctor_id, SlotCapacity.appointment_date).filter(
+            SlotCapacity.doctor_id.in_(doctor_ids),
+            SlotCapacity.appointment_date.between(start, end),
+            SlotCapacity.booked >= SlotCapacity.capacity)
+        for doctor_id, day in full:
+            masks[(doctor_id, day)] = self.full_day
+        expires = clock.monotonic() + self.ttl
+        with self._lock:
+            for key, mask in masks.items():
+                self._booked[key] = (mask, expires)
+
+    def _prune(self):
+        now = clock.monotonic()
+        with self._lock:
+            for key in [key for key, (_, expires) in self._booked.items() if expires < now]:
+                del self._booked[key]
+
+    def booked(self, doctor_id, day):
+        entry = self._booked.get((doctor_id, day))
+        if entry is None or entry[1] < clock.monotonic():
+            self._load([doctor_id], day)
+            entry = self._booked[(doctor_id, day)]
+        return entry[0]
+
+    def forget(self, doctor_id, day):
+        """Drop the cached bitmap so the next search reloads it."""
+        with self._lock:
+            self._booked.pop((doctor_id, day), None)
+
+    def mark(self, doctor_id, day, at, booked=True):
+        """Record a booking (or a cancellation) made by this worker."""
+        index = slot_index(at, self.slot_minutes) if at else None
+        if index is None:
+            # A whole-day booking changes the capacity ledger, not a slot.
+            self.forget(doctor_id, day)
+            return
+        with self._lock:
+            entry = self._booked.get((doctor_id, day))
+            if entry is None:
+                return
+            mask, expires = entry
+            if booked:
+                self._booked[(doctor_id, day)] = (mask | (1 << index), expires)
+            else:
+                self._booked[(doctor_id, day)] = (mask & ~(1 << index), expires)
+
+    def weekly_hours(self, doctor_id):
+        """(start, end) per weekday, Monday first, with None for days off."""
+        rows = WorkingHours.query.filter_by(doctor_id=doctor_id).all()
+        if not rows:
+            return [DEFAULT_HOURS.get(weekday) for weekday in range(7)]
+        hours = [None] * 7
+        for row in rows:
+            if row.start_time < row.end_time:
+                hours[row.weekday] = (row.start_time, row.end_time)
+        return hours
+
+    def set_weekly_hours(self, doctor_id, hours):
+        """Replace the doctor's template. The caller commits, then calls invalidate_templates()."""
+        WorkingHours.query.filter_by(doctor_id=doctor_id).delete()
+        for weekday, span in enumerate(hours):
+            # Days off are stored as empty spans so they do not fall back to DEFAULT_HOURS.
+            start, end = span or (time(0, 0), time(0, 0))
+            db.session.add(WorkingHours(doctor_id=doctor_id, weekday=weekday, start_time=start, end_time=end))
+
+    def is_open(self, doctor_id, day, at):
+        index = slot_index(at, self.slot_minutes)
+        return index is not None and bool(self.template(doctor_id)[day.weekday()] >> index & 1)
+
+    def has_started(self, day, at, now=None):
+        """Whether the slot at ``at`` on ``day`` is already under way or over, as ``free_slots`` sees it."""
+        now = now or datetime.now()
+        if day != now.date():
+            return day < now.date()
+        return _minutes(at) // self.slot_minutes <= _minutes(now.time()) // self.slot_minutes
+
+    # -- search ------------------------------------------------------------
+
+    def free_slots(self, doctor_ids, start, limit, now=None):
+        """The first ``limit`` free slots of any of ``doctor_ids`` from ``start`` on.
+
+        Returns (day, time, doctor_id) tuples ordered by day, time and the
+        order of ``doctor_ids``.
+        """
+        now = now or datetime.now()
+        start = max(start, now.date())
+        templates = self.templates()
+        doctors = [(doctor_id, templates.get(doctor_id) or self.default_template) for doctor_id in doctor_ids]
+        if len(self._booked) > 4 * len(doctors) * self.horizon_days:
+            self._prune()
+        # Slots of today that have already started are not offered.
+        started = (1 << (_minutes(now.time()) // self.slot_minutes + 1)) - 1
+
+        found = []
+        stale_before = clock.monotonic()
+        for offset in range(self.horizon_days):
+            day = start + timedelta(days=offset)
+            weekday = day.weekday()
+            missing = [doctor_id for doctor_id, masks in doctors if masks[weekday] and
+                       self._booked.get((doctor_id, day), (0, 0.0))[1] < stale_before]
+            if missing:
+                self._load(missing, day)
+            free = []
+            union = 0
+            for doctor_id, masks in doctors:
+                open_slots = masks[weekday]
+                if not open_slots:
+                    continue
+                entry = self._booked.get((doctor_id, day))
+                mask = open_slots & ~(entry[0] if entry else self.booked(doctor_id, day))
+                if day == now.date():
+                    mask &= ~started
+                if mask:
+                    free.append((doctor_id, mask))
+                    union |= mask
+            for index in _bits(union):
+                at = slot_time(index, self.slot_minutes)
+                for doctor_id, mask in free:
+                    if mask >> index & 1:
+                        found.append((day, at, doctor_id))
+                        if len(found) == limit:
+                            return found
+        return found
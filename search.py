@@ -0,0 +1,171 @@
+"""Full-text search over appointment reasons, prescriptions and patients.
+
+Every appointment and prescription has a row in ``search_documents``
+carrying its text, with the patient's name and phone added to the
+appointment row. The rows are written in the same transaction as the
+appointment or prescription, so the index is updated incrementally and
+never needs a batch job. They are deleted with their appointment by
+ON DELETE CASCADE.
+
+The inverted index itself belongs to the database:
+
+* SQLite: an FTS5 table over ``search_documents`` kept in step by
+  triggers, ranked with ``bm25``.
+* MySQL: a FULLTEXT index on ``search_documents.body``, ranked by
+  ``MATCH ... AGAINST`` relevance.
+* Anything else falls back to ``LIKE`` scans, which is correct but slow.
+
+``make_search(dialect)`` picks the backend. Every query is scoped to one
+doctor and returns pages ranked best first. Each search term matches as
+a prefix, and all terms must match.
+"""
+import re
+
+from sqlalchemy import delete, insert, literal, select, text
+
+from models import db, Appointment, Prescription, SearchDocument, User
+
+MAX_TERMS = 8
+documents = SearchDocument.__table__
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def appointment_body(appointment, patient):
+    return f"{appointment.appointment_details} {patient.fullname} {patient.phone}"
+
+
+def index_appointment(appointment, patient):
+    """Add a new appointment to the index. Runs in the caller's transaction, after the appointment is flushed."""
+    db.session.execute(insert(documents).values(
+        doctor_id=appointment.doctor_id, patient_id=appointment.patient_id, appointment_id=appointment.id,
+        kind='appointment', body=appointment_body(appointment, patient)))
+
+
+def index_prescription(prescription):
+    db.session.execute(insert(documents).values(
+        doctor_id=prescription.doctor_id, patient_id=prescription.patient_id,
+        appointment_id=prescription.appointment_id, kind='prescription', body=prescription.prescriptions or ''))
+
+
+def backfill(conn):
+    """Index every existing appointment and prescription. Run once, on an empty ``search_documents``."""
+    columns = ['doctor_id', 'patient_id', 'appointment_id', 'kind', 'body']
+    conn.execute(insert(documents).from_select(columns, select(
+        Appointment.doctor_id, Appointment.patient_id, Appointment.id, literal('appointment'),
+        Appointment.appointment_details + ' ' + User.fullname + ' ' + User.phone,
+    ).join(User, User.id == Appointment.patient_id)))
+    # The join skips prescriptions whose appointment is gone; older code left
+    # them behind, and they would break the foreign key.
+    conn.execute(insert(documents).from_select(columns, select(
+        Prescription.doctor_id, Prescription.patient_id, Prescription.appointment_id, literal('prescription'),
+        Prescription.prescriptions,
+    ).join(Appointment, Appointment.id == Prescription.appointment_id)
+     .where(Prescription.prescriptions.isnot(None))))
+
+
+def rebuild(conn):
+    """Re-derive every document, for rows written behind the app's back (bulk loads, manual fixes)."""
+    conn.execute(delete(documents))
+    backfill(conn)
+
+
+class Search:
+    """Backend interface: build the index, then run scoped, ranked queries."""
+
+    def create(self, conn):
+        """Create the inverted index over ``search_documents`` (idempotent)."""
+
+    def hits(self, words, doctor_id, limit, offset):
+        """Subquery of (id, score) for one page of ``doctor_id``'s documents matching all ``words``.
+
+        Lower scores rank first. Ranking and paging happen here, before any
+        join, so a common word costs one pass over the index and not a join
+        per matching document.
+        """
+        raise NotImplementedError
+
+    def search(self, doctor_id, query, page=1, per_page=20):
+        """One page of (rows, has_next) for ``doctor_id``'s documents matching ``query``.
+
+        Rows have kind, appointment_id, appointment_date, patient_id,
+        patient_name and body.
+        """
+        words = terms(query)
+        if not words:
+            return [], False
+        hits = self.hits(words, doctor_id, per_page + 1, (page - 1) * per_page)
+        stmt = select(
+            documents.c.kind, documents.c.appointment_id, Appointment.appointment_date,
+            documents.c.patient_id, User.fullname.label('patient_name'), documents.c.body,
+        ).join(hits, hits.c.id == documents.c.id) \
+         .join(Appointment, Appointment.id == documents.c.appointment_id) \
+         .join(User, User.id == documents.c.patient_id) \
+         .order_by(hits.c.score, documents.c.id.desc())
+        rows = db.session.execute(stmt).all()
+        return rows[:per_page], len(rows) > per_page
+
+
+class Fts5Search(Search):
+    # doctor_id is indexed as a token too, so the doctor scope is applied
+    # inside the inverted index instead of filtering every match afterwards.
+    def create(self, conn):
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+            "body, doctor_id, content='search_documents', content_rowid='id', prefix='2 3 4')"))
+        conn.execute(text("INSERT INTO search_fts(search_fts) VALUES ('rebuild')"))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+            "INSERT INTO search_fts(rowid, body, doctor_id) VALUES (new.id, new.body, new.doctor_id); END"))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+            "INSERT INTO search_fts(search_fts, rowid, body, doctor_id) "
+            "VALUES ('delete', old.id, old.body, old.doctor_id); END"))
+
+    def hits(self, words, doctor_id, limit, offset):
+        match = f'doctor_id : "{int(doctor_id)}" AND body : (' + ' AND '.join(f'"{word}"*' for word in words) + ')'
+        # bm25() is lower for better matches; the doctor_id column gets no weight.
+        return text("SELECT rowid AS id, bm25(search_fts, 1.0, 0.0) AS score FROM search_fts "
+                    "WHERE search_fts MATCH :match ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset") \
+            .bindparams(match=match, limit=limit, offset=offset) \
+            .columns(id=db.Integer, score=db.Float).subquery('hits')
+
+
+class MysqlFulltextSearch(Search):
+    # InnoDB ignores words shorter than innodb_ft_min_token_size (3 by
+    # default); requiring them with '+' would make every query miss.
+    min_length = 3
+
+    def create(self, conn):
+        indexes = conn.execute(text(
+            "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() "
+            "AND table_name = 'search_documents' AND index_name = 'ft_search_documents_body'")).first()
+        if not indexes:
+            conn.execute(text("ALTER TABLE search_documents ADD FULLTEXT INDEX ft_search_documents_body (body)"))
+
+    def hits(self, words, doctor_id, limit, offset):
+        words = [word for word in words if len(word) >= self.min_length] or words
+        return text("SELECT id, -MATCH (body) AGAINST (:natural) AS score FROM search_documents "
+                    "WHERE doctor_id = :doctor_id AND MATCH (body) AGAINST (:boolean IN BOOLEAN MODE) "
+                    "ORDER BY score, id DESC LIMIT :limit OFFSET :offset") \
+            .bindparams(natural=' '.join(words), boolean=' '.join(f'+{word}*' for word in words),
+                        doctor_id=doctor_id, limit=limit, offset=offset) \
+            .columns(id=db.Integer, score=db.Float).subquery('hits')
+
+
+class LikeSearch(Search):
+    def hits(self, words, doctor_id, limit, offset):
+        return select(documents.c.id, literal(0.0).label('score')) \
+            .where(documents.c.doctor_id == doctor_id,
+                   *(documents.c.body.ilike(f'%{word}%') for word in words)) \
+            .order_by(documents.c.id.desc()).limit(limit).offset(offset).subquery('hits')
+
+
+def make_search(dialect):
+    if dialect == 'sqlite':
+        return Fts5Search()
+    if dialect == 'mysql':
+        return MysqlFulltextSearch()
+    return LikeSearch()
@@ -0,0 +1,252 @@
+"""Server-side sessions shared by every worker and node.
+
+The cookie carries only a signed random session id; the session data
+lives in a ``SessionStore``. ``DatabaseSessionStore`` keeps it in the
+``sessions`` table. ``RedisSessionStore`` works with any client exposing
+``get``/``setex``/``delete`` — redis-py, or ``LocalRedis`` for tests and
+single-box setups.
+
+Reads go through a small per-process cache (SESSION_CACHE_TTL seconds),
+so ``session.get('id')`` in every route does not cost a store round-trip.
+A write made on another worker may therefore be seen here up to that
+many seconds late. Expired rows are swept at most once per
+SESSION_SWEEP_INTERVAL per process, or by ``flask sweep-sessions``.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import delete, insert, update
+from werkzeug.datastructures import CallbackDict
+
+from models import db, StoredSession
+
+serializer = TaggedJSONSerializer()
+
+
+class SessionStore:
+    """Backend interface. ``expires`` is a naive UTC datetime."""
+
+    def get(self, sid):
+        """Return the stored payload string, or None when missing or expired."""
+        raise NotImplementedError
+
+    def set(self, sid, payload, expires):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def sweep(self):
+        """Remove expired sessions and return how many were removed."""
+        return 0
+
+
+class DatabaseSessionStore(SessionStore):
+    # Core statements on their own connection, so a session write never
+    # commits or rolls back whatever the request left in db.session.
+    table = StoredSession.__table__
+
+    def get(self, sid):
+        with db.engine.connect() as conn:
+            row = conn.execute(self.table.select().where(self.table.c.id == sid)).first()
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return row.data
+
+    def set(self, sid, payload, expires):
+        with db.engine.begin() as conn:
+            result = conn.execute(update(self.table).where(self.table.c.id == sid)
+                                  .values(data=payload, expires_at=expires))
+            if result.rowcount == 0:
+                conn.execute(insert(self.table).values(id=sid, data=payload, expires_at=expires))
+
+    def delete(self, sid):
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def sweep(self):
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    def __init__(self, client, prefix='session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        value = self.client.get(self.prefix + sid)
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def set(self, sid, payload, expires):
+        ttl = max(int((expires - datetime.utcnow()).total_seconds()), 1)
+        self.client.setex(self.prefix + sid, ttl, payload)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the Redis API the session store uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (None, 0))
+            if value is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def setex(self, key, seconds, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + seconds)
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+def make_store(config):
+    backend = config['SESSION_BACKEND']
+    if backend == 'database':
+        return DatabaseSessionStore()
+    if backend == 'redis':
+        import redis  # optional dependency, only needed for this backend
+        return RedisSessionStore(redis.Redis.from_url(config['SESSION_REDIS_URL']))
+    if backend == 'local-redis':
+        return RedisSessionStore(LocalRedis())
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.stale_sids = []
+
+    def regenerate(self):
+        """Move the data to a fresh sid. The old sid is deleted from the store when the session is saved.
+
+        Call it whenever the user behind the session changes (login,
+        registration, logout) so a sid planted before that is useless.
+        """
+        self.stale_sids.append(self.sid)
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    def __init__(self, store, cache_ttl=2.0, cache_size=1024, sweep_interval=300):
+        self.store = store
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.sweep_interval = sweep_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-session')
+
+    def _cached(self, sid):
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._cache[sid]
+                return None
+            self._cache.move_to_end(sid)
+            return entry[0]
+
+    def _remember(self, sid, payload):
+        if not self.cache_ttl:
+            return
+        with self._lock:
+            self._cache[sid] = (payload, time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                # Payloads are cached as strings so each request gets its own copy.
+                payload = self._cached(sid)
+                if payload is None:
+                    payload = self.store.get(sid)
+                    if payload is not None:
+                        self._remember(sid, payload)
+                if payload is not None:
+                    return ServerSession(serializer.loads(payload), sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        for sid in session.stale_sids:
+            self.store.delete(sid)
+            self._forget(sid)
+        session.stale_sids = []
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                self._forget(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Unmodified sessions are not rewritten or re-sent; refreshing them on
+        # every request would turn each page view into a store write.
+        if not session.modified:
+            return
+        payload = serializer.dumps(dict(session))
+        self.store.set(session.sid, payload, datetime.utcnow() + app.permanent_session_lifetime)
+        self._remember(session.sid, payload)
+        self._maybe_sweep()
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.store.sweep()
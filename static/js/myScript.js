@@ -81,3 +81,87 @@ function hidePopup() {
     document.getElementById('popupOverlay').classList.remove('show');
 }
 
+
+// Load more appointments
+const load_more_btn = document.getElementById("load-more");
+
+if (load_more_btn) {
+  load_more_btn.addEventListener("click", () => {
+    const url = new URL(load_more_btn.dataset.url, window.location.origin);
+    url.searchParams.set("after", load_more_btn.dataset.next);
+    load_more_btn.disabled = true;
+    fetch(url)
+      .then((res) => res.json())
+      .then((data) => {
+        if (data.html) {
+          document.querySelector(".container-body").insertAdjacentHTML("beforeend", data.html);
+        }
+        if (data.next) {
+          load_more_btn.dataset.next = data.next;
+          load_more_btn.disabled = false;
+        } else {
+          load_more_btn.parentElement.remove();
+        }
+      })
+      .catch(() => {
+        load_more_btn.disabled = false;
+      });
+  });
+}
+
+
+// Live updates: patch appointment rows and prescriptions in place
+const live_list = document.querySelector(".container-body[data-events]");
+const live_prescription = document.querySelector(".prescription[data-events]");
+const live_root = live_list || live_prescription;
+
+if (live_root && window.EventSource) {
+  const source = new EventSource(live_root.dataset.events);
+
+  if (live_list) {
+    source.addEventListener("appointment.created", (e) => {
+      const data = JSON.parse(e.data);
+      const doctor = live_list.dataset.role === "Doctor";
+      if (doctor && (data.date < live_list.dataset.start || data.date > live_list.dataset.end)) return;
+      if (live_list.querySelector(`[data-appointment-id="${data.id}"]`)) return;
+      const later = Array.from(live_list.querySelectorAll("[data-appointment-id]"))
+        .find((row) => row.dataset.date > data.date);
+      if (later) {
+        later.insertAdjacentHTML("beforebegin", data.html);
+      } else if (!document.getElementById("load-more")) {
+        // Rows past the last loaded page arrive with "Load more" instead.
+        live_list.insertAdjacentHTML("beforeend", data.html);
+      }
+      const empty = document.getElementById("no-appointment");
+      if (empty) empty.remove();
+    });
+
+    source.addEventListener("appointment.status", (e) => {
+      const data = JSON.parse(e.data);
+      const row = live_list.querySelector(`[data-appointment-id="${data.id}"]`);
+      if (!row) return;
+      // The worklist only lists scheduled appointments; cancelled and deleted ones are gone for everyone.
+      if (live_list.dataset.role === "Doctor" || data.status === "Cancelled" || data.status === "Deleted") {
+        row.remove();
+      } else {
+        row.querySelector(".container-appointments").dataset.status = data.status;
+      }
+    });
+  }
+
+  if (live_prescription) {
+    source.addEventListener("prescription.added", (e) => {
+      const data = JSON.parse(e.data);
+      if (String(data.appointment_id) !== live_prescription.dataset.appointmentId) return;
+      const display = live_prescription.querySelector(".prescription-display");
+      if (display) {
+        const missing = display.querySelector(".not-given");
+        if (missing) missing.remove();
+        const text = document.createElement("p");
+        text.className = "prescribed-text";
+        text.textContent = data.prescriptions;
+        display.appendChild(text);
+      }
+    });
+  }
+}
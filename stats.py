@@ -0,0 +1,105 @@
+"""Per-doctor daily appointment counts, kept up to date as appointments change.
+
+``doctor_daily_stats`` holds one counter per (doctor, appointment day,
+status). The views that create, complete, cancel or delete an appointment
+adjust the counters in the same transaction, so the profile panel reads
+a few rows per day instead of grouping ``appointments``. Only "patients
+seen" (distinct patients, which counters cannot add up) is counted from
+``appointments``, through ix_appointments_doctor_date_status.
+
+Cancelling an appointment deletes it, so the "Cancelled" counters are the
+only record of cancellations. ``rebuild`` recomputes every other status
+from ``appointments`` and leaves them alone, and ``check`` compares only
+the statuses it can recompute.
+
+    flask --app app rebuild-stats
+    flask --app app check-stats
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Appointment, DoctorDailyStats
+
+CANCELLED = 'Cancelled'
+stats = DoctorDailyStats.__table__
+
+
+def bump(doctor_id, day, status, delta=1):
+    """Add ``delta`` to one counter. Runs in the caller's transaction."""
+    match = (stats.c.doctor_id == doctor_id, stats.c.day == day, stats.c.status == status)
+    result = db.session.execute(update(stats).where(*match).values(count=stats.c.count + delta))
+    if result.rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(stats).values(doctor_id=doctor_id, day=day, status=status, count=delta))
+    except IntegrityError:
+        # Another worker created the counter first.
+        db.session.execute(update(stats).where(*match).values(count=stats.c.count + delta))
+
+
+def move(doctor_id, day, old_status, new_status, count=1):
+    if old_status != new_status:
+        bump(doctor_id, day, old_status, -count)
+        bump(doctor_id, day, new_status, count)
+
+
+def live_counts():
+    """Counters recomputed from ``appointments``."""
+    return select(Appointment.doctor_id, Appointment.appointment_date, Appointment.status, func.count()) \
+        .group_by(Appointment.doctor_id, Appointment.appointment_date, Appointment.status)
+
+
+def rebuild(conn):
+    """Recompute every counter except cancellations from ``appointments``."""
+    conn.execute(delete(stats).where(stats.c.status != CANCELLED))
+    conn.execute(insert(stats).from_select(['doctor_id', 'day', 'status', 'count'],
+                                           live_counts().where(Appointment.status != CANCELLED)))
+
+
+def check(conn):
+    """Return (doctor_id, day, status, stored, actual) for every counter that drifted."""
+    actual = {(doctor_id, day, status): count for doctor_id, day, status, count in conn.execute(live_counts())}
+    stored = {(row.doctor_id, row.day, row.status): row.count
+              for row in conn.execute(select(stats).where(stats.c.status != CANCELLED))}
+    drift = []
+    for key in sorted(actual.keys() | stored.keys()):
+        if actual.get(key, 0) != stored.get(key, 0):
+            drift.append((*key, stored.get(key, 0), actual.get(key, 0)))
+    return drift
+
+
+def summary(doctor_id, days=14, today=None):
+    """Stats of the last ``days`` days up to ``today`` for the profile panel."""
+    today = today or date.today()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.query(DoctorDailyStats.day, DoctorDailyStats.status, DoctorDailyStats.count).filter(
+        DoctorDailyStats.doctor_id == doctor_id,
+        DoctorDailyStats.day.between(start, today))
+    per_day = {start + timedelta(days=n): 0 for n in range(days)}
+    totals = {}
+    for day, status, count in rows:
+        totals[status] = totals.get(status, 0) + count
+        if status != CANCELLED:
+            per_day[day] += count
+    completed = totals.get('Completed', 0)
+    cancelled = totals.get(CANCELLED, 0)
+    booked = sum(totals.values())
+    # Counters are per appointment; a patient seen three times is still one patient.
+    patients_seen = db.session.query(func.count(Appointment.patient_id.distinct())).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.status == 'Completed',
+        Appointment.appointment_date.between(start, today)).scalar()
+    return {
+        'start': start,
+        'end': today,
+        'per_day': sorted(per_day.items()),
+        'busiest': max(per_day.values()),
+        'appointments': booked - cancelled,
+        'completed': completed,
+        'cancelled': cancelled,
+        'patients_seen': patients_seen,
+        'completion_rate': completed / booked if booked else None,
+    }
@@ -0,0 +1,183 @@
+"""Background profile-picture uploads.
+
+Routes read the uploaded file into memory, hand it to an ``UploadQueue``
+and return straight away. A small thread pool pushes the bytes to the
+configured media backend, retrying with exponential backoff, and reports
+the final URL through the ``on_complete`` callback.
+"""
+import io
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are optional, originals are served instead
+    Image = None
+
+log = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 160, 320)
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+# Magic numbers, for when Pillow is not installed.
+SIGNATURES = ((b'\xff\xd8\xff', 'JPEG'), (b'\x89PNG\r\n\x1a\n', 'PNG'), (b'GIF87a', 'GIF'), (b'GIF89a', 'GIF'))
+
+
+def image_extension(data):
+    """File extension for the image format of ``data``, or None when it is not a supported image.
+
+    The format is read from the bytes, never from the client's file name.
+    """
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+                fmt = img.format
+        except Exception:
+            return None
+    else:
+        fmt = next((name for signature, name in SIGNATURES if data.startswith(signature)), None)
+        if fmt is None and data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            fmt = 'WEBP'
+    return IMAGE_EXTENSIONS.get(fmt)
+
+
+class CloudinaryBackend:
+    def __init__(self, cloud_name, api_key, api_secret):
+        # Imported here so apps using the local backend never load the SDK.
+        import cloudinary
+        import cloudinary.uploader
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret)
+        self.uploader = cloudinary.uploader
+
+    def thumbnail_url(self, url, size):
+        # Let Cloudinary crop and resize on its CDN instead of shipping the original.
+        if '/upload/' not in url:
+            return url
+        return url.replace('/upload/', f'/upload/c_fill,w_{size},h_{size},f_auto,q_auto/', 1)
+
+    def upload(self, data, filename):
+        res = self.uploader.upload(data)
+        return res["secure_url"].strip()
+
+    def delete(self, url):
+        public_id = url.split('/')[-1].split('.')[0].strip()
+        res = self.uploader.destroy(public_id)
+        if res.get("result") != "ok":
+            raise RuntimeError(f"Cloudinary could not delete {public_id}: {res}")
+
+
+class LocalBackend:
+    """Stores uploads under ``root`` and serves them below ``base_url``.
+
+    Every upload gets its own randomly named file, so a URL never changes
+    meaning and can be cached forever, and deleting one user's picture
+    never affects another's. The extension comes from the detected image
+    format. Square thumbnails are rendered once
+    per size and format into ``root/thumbs``.
+    """
+
+    def __init__(self, root, base_url='/media'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        self.thumb_root = os.path.join(root, 'thumbs')
+        os.makedirs(self.thumb_root, exist_ok=True)
+
+    def upload(self, data, filename):
+        ext = image_extension(data)
+        if ext is None:
+            raise ValueError(f"{filename!r} is not a supported image")
+        name = f"{secrets.token_hex(16)}{ext}"
+        self._write(os.path.join(self.root, name), data)
+        return f"{self.base_url}/{name}"
+
+    def delete(self, url):
+        if not self.owns(url):
+            return
+        name = os.path.basename(url)
+        stem = os.path.splitext(name)[0]
+        for thumb in os.listdir(self.thumb_root):
+            if thumb.startswith(stem + '-'):
+                os.remove(os.path.join(self.thumb_root, thumb))
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def owns(self, url):
+        return bool(url) and url.startswith(self.base_url + '/')
+
+    def thumbnail_url(self, url, size):
+        if not self.owns(url):
+            return url
+        return f"{self.base_url}/thumbs/{size}/{os.path.basename(url)}"
+
+    def thumbnail(self, name, size, fmt='jpeg'):
+        """Path of the ``size`` x ``size`` thumbnail of ``name``, rendering it on first use.
+
+        Returns the original's path when Pillow is not installed.
+        """
+        source = os.path.join(self.root, name)
+        if Image is None:
+            return source
+        ext = 'webp' if fmt == 'webp' else 'jpg'
+        path = os.path.join(self.thumb_root, f"{os.path.splitext(name)[0]}-{size}.{ext}")
+        if not os.path.exists(path):
+            with Image.open(source) as img:
+                thumb = ImageOps.fit(ImageOps.exif_transpose(img).convert('RGB'), (size, size))
+            tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            thumb.save(tmp, format='WEBP' if ext == 'webp' else 'JPEG', quality=85)
+            os.replace(tmp, path)
+        return path
+
+    def _write(self, path, data):
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+
+def make_backend(config):
+    if config.get('MEDIA_BACKEND') == 'local':
+        return LocalBackend(config['MEDIA_ROOT'], config.get('MEDIA_URL', '/media'))
+    return CloudinaryBackend(config.get('CLOUDINARY_CLOUD_NAME'),
+                             config.get('CLOUDINARY_API_KEY'),
+                             config.get('CLOUDINARY_API_SECRET'))
+
+
+class UploadQueue:
+    def __init__(self, backend, on_complete, workers=2, retries=3, backoff=0.5):
+        self.backend = backend
+        self.on_complete = on_complete
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+
+    def submit(self, user_id, data, filename, replace_url=None):
+        """Queue ``data`` as the new picture of ``user_id``; ``replace_url`` is removed once it is live."""
+        return self._pool.submit(self._run, user_id, data, filename, replace_url)
+
+    def _run(self, user_id, data, filename, replace_url):
+        url = self._attempt(self.backend.upload, data, filename)
+        if url is None:
+            log.error("Giving up on profile picture upload for user %s", user_id)
+            return None
+        self.on_complete(user_id, url)
+        if replace_url and replace_url != url:
+            self._attempt(self.backend.delete, replace_url)
+        return url
+
+    def _attempt(self, fn, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args)
+            except Exception:
+                log.warning("%s failed (attempt %d/%d)", fn.__name__, attempt + 1, self.retries + 1, exc_info=True)
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return None
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)